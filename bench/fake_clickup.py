@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+TASK_PATH_PATTERN = re.compile(r'^/api/v2/task/([^/?]+)')
+TEAM_TASKS_PATH_PATTERN = re.compile(r'^/api/v2/team/([^/?]+)/task')
+TEAM_TASKS_PAGE_SIZE = 100
+
+
+class FakeClickUp:
+    known_task_ids: set[str]
+    latency: float
+    rate_limit: int
+    window: float
+
+    def __init__(self, known_task_ids: set[str], latency: float = 0.05, rate_limit: int = 0, window: float = 60.0):
+        self.known_task_ids = known_task_ids
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = window
+        self.request_count = 0
+        self.throttled_count = 0
+        self.statuses = {}
+        # Milliseconds since the epoch, spread out so that ordering and date_updated_gt can be exercised
+        started = int(time.time() * 1000)
+        self.updated = {task_id: started + i for i, task_id in enumerate(sorted(known_task_ids))}
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._window_count = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v2"
+
+    def reset_counters(self):
+        with self._lock:
+            self.request_count = 0
+            self.throttled_count = 0
+
+    # Returns whether the request has to be rejected and the rate-limit headers ClickUp answers with
+    def _take_quota(self) -> (bool, dict):
+        with self._lock:
+            self.request_count += 1
+            if not self.rate_limit:
+                return False, {}
+            now = time.time()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            throttled = self._window_count > self.rate_limit
+            if throttled:
+                self.throttled_count += 1
+            return throttled, {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(max(0, self.rate_limit - self._window_count)),
+                "X-RateLimit-Reset": str(math.ceil(self._window_start + self.window)),
+            }
+
+    def task(self, task_id: str) -> dict:
+        return {
+            "id": task_id,
+            "custom_id": None,
+            "name": f"Task {task_id}",
+            "url": f"https://app.clickup.com/t/{task_id}",
+            "status": {"status": self.statuses.get(task_id, "open")},
+            "date_updated": str(self.updated.get(task_id, 0)),
+        }
+
+    def team_tasks_page(self, page: int, updated_gt: int | None = None, newest_first: bool = True) -> dict:
+        task_ids = sorted(self.known_task_ids, key=lambda task_id: self.updated.get(task_id, 0), reverse=newest_first)
+        if updated_gt is not None:
+            task_ids = [task_id for task_id in task_ids if self.updated.get(task_id, 0) > updated_gt]
+        start = page * TEAM_TASKS_PAGE_SIZE
+        tasks = [self.task(task_id) for task_id in task_ids[start:start + TEAM_TASKS_PAGE_SIZE]]
+        return {"tasks": tasks, "last_page": start + TEAM_TASKS_PAGE_SIZE >= len(task_ids)}
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> FakeClickUp:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            quota_headers = {}
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: dict | None = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in {**self.quota_headers, **(headers or {})}.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                time.sleep(fake.latency)
+
+                throttled, self.quota_headers = fake._take_quota()
+                if throttled:
+                    self._send(429, {"err": "Rate limit reached", "ECODE": "APP_002"})
+                    return
+
+                if method == "GET" and TEAM_TASKS_PATH_PATTERN.match(self.path):
+                    query = parse_qs(urlparse(self.path).query)
+                    updated_gt = query.get("date_updated_gt")
+                    self._send(200, fake.team_tasks_page(
+                        int(query.get("page", ["0"])[0]),
+                        int(updated_gt[0]) if updated_gt else None,
+                        query.get("reverse", ["false"])[0] == "true",
+                    ))
+                    return
+
+                match = TASK_PATH_PATTERN.match(self.path)
+                if not match:
+                    self._send(404, {"err": "Route not found"})
+                    return
+                task_id = match.group(1)
+                if task_id not in fake.known_task_ids:
+                    self._send(404, {"err": "Task not found", "ECODE": "ITEM_013"})
+                    return
+                if method == "PUT":
+                    status = json.loads(body or b"{}").get("status")
+                    if status:
+                        fake.statuses[task_id] = status
+                        fake.updated[task_id] = int(time.time() * 1000)
+                self._send(200, fake.task(task_id))
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_PUT(self):
+                self._handle("PUT")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stand-in ClickUp API for benchmarks and tests")
+    parser.add_argument("task_ids", nargs="*", help="Task ids that exist; every other id answers 404")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests allowed per window, 0 for unlimited")
+    parser.add_argument("--window", type=float, default=60.0, help="Length of the rate-limit window in seconds")
+    args = parser.parse_args()
+
+    fake = FakeClickUp(set(args.task_ids), args.latency, args.rate_limit, args.window).start(port=args.port)
+    print(f"Serving on {fake.url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
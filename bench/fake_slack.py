@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WEBHOOK_PATH_PREFIX = "/services/"
+CHAT_POST_MESSAGE_PATH = "/api/chat.postMessage"
+MAX_BLOCKS_PER_MESSAGE = 50
+
+
+class FakeSlack:
+    latency: float
+    # The first failures requests answer 503 so that retries can be exercised
+    failures: int
+
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.request_count = 0
+        # Every accepted message, in the order it arrived
+        self.messages = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def webhook_url(self) -> str:
+        return f"{self.url}{WEBHOOK_PATH_PREFIX}T000/B000/bench"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api"
+
+    def _accept(self, message: dict) -> (int, str | None):
+        with self._lock:
+            self.request_count += 1
+            if self.request_count <= self.failures:
+                return 503, "service_unavailable"
+            if len(message.get("blocks") or []) > MAX_BLOCKS_PER_MESSAGE:
+                return 400, "invalid_blocks"
+            self.messages.append(message)
+            return 200, f"{time.time():.6f}"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> FakeSlack:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: str, content_type: str = "text/plain"):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                time.sleep(fake.latency)
+                try:
+                    message = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, "invalid_payload")
+                    return
+
+                status, result = fake._accept(message)
+                if self.path.startswith(WEBHOOK_PATH_PREFIX):
+                    # Webhooks answer a bare "ok" or the error code as plain text
+                    self._send(status, "ok" if status == 200 else result)
+                elif self.path == CHAT_POST_MESSAGE_PATH:
+                    if status == 503:
+                        self._send(status, result)
+                    elif status == 200:
+                        self._send(200, json.dumps({"ok": True, "channel": message.get("channel"), "ts": result}),
+                                   "application/json")
+                    else:
+                        self._send(200, json.dumps({"ok": False, "error": result}), "application/json")
+                else:
+                    self._send(404, "no_service")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stand-in Slack webhook and chat.postMessage for tests")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--failures", type=int, default=0, help="Answer 503 to this many requests first")
+    args = parser.parse_args()
+
+    fake = FakeSlack(args.latency, args.failures).start(port=args.port)
+    print(f"Webhook: {fake.webhook_url}", flush=True)
+    print(f"SLACK_API_URL: {fake.api_url}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+            while fake.messages:
+                print(json.dumps(fake.messages.pop(0)), flush=True)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
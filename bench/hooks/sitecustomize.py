@@ -0,0 +1,25 @@
+# Loaded through PYTHONPATH by bench/run.py to count the subprocesses an entry point starts
+import atexit
+import os
+import subprocess
+import threading
+
+_log_path = os.environ.get("BENCH_SUBPROCESS_LOG")
+
+if _log_path:
+    _count = 0
+    _count_lock = threading.Lock()
+    _original_init = subprocess.Popen.__init__
+
+    def _counting_init(self, *args, **kwargs):
+        global _count
+        with _count_lock:
+            _count += 1
+        _original_init(self, *args, **kwargs)
+
+    def _write_count():
+        with open(_log_path, "a") as file:
+            file.write(f"{_count}\n")
+
+    subprocess.Popen.__init__ = _counting_init
+    atexit.register(_write_count)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_clickup import FakeClickUp
+from synthetic_repo import RepoConfig, create_repo, task_ids
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_DIR = os.path.join(os.path.dirname(BENCH_DIR), "script")
+HOOKS_DIR = os.path.join(BENCH_DIR, "hooks")
+
+
+class PhaseResult:
+    name: str
+    wall_time: float
+    subprocesses: int
+    http_requests: int
+    throttled_requests: int
+    returncode: int
+    # Seconds per trace category recorded by the entry point itself
+    spans: dict[str, float]
+
+    def __init__(self, name: str, wall_time: float, subprocesses: int = 0, http_requests: int = 0,
+                 throttled_requests: int = 0, returncode: int = 0, spans: dict[str, float] | None = None):
+        self.name = name
+        self.wall_time = wall_time
+        self.subprocesses = subprocesses
+        self.http_requests = http_requests
+        self.throttled_requests = throttled_requests
+        self.returncode = returncode
+        self.spans = spans or {}
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "wall_time": round(self.wall_time, 4),
+            "subprocesses": self.subprocesses,
+            "http_requests": self.http_requests,
+            "throttled_requests": self.throttled_requests,
+            "returncode": self.returncode,
+            "spans": {category: round(seconds, 4) for category, seconds in self.spans.items()},
+        }
+
+
+def run_entry_point(name: str, args: list[str], repo: str, fake: FakeClickUp, work_dir: str,
+                    extra_env: dict[str, str]) -> PhaseResult:
+    subprocess_log = os.path.join(work_dir, f"{name}.subprocesses")
+    trace_file = os.path.join(work_dir, f"{name}.trace.json")
+    env = dict(os.environ)
+    for key in ["CLICKUP_CACHE_PATH", "CLICKUP_MIRROR_PATH", "RELEASE_INDEX_PATH", "GITHUB_REPOSITORY",
+                "CLICKUP_TEAM_ID", "CLICKUP_RATE_LIMIT", "CLICKUP_RATE_LIMIT_BURST"]:
+        env.pop(key, None)
+    env.update({
+        "CLICKUP_TOKEN": "bench",
+        "CLICKUP_API_URL": fake.url,
+        "PYTHONPATH": os.pathsep.join(filter(None, [HOOKS_DIR, os.environ.get("PYTHONPATH")])),
+        "BENCH_SUBPROCESS_LOG": subprocess_log,
+        # Keeps the limiter state of every run apart from the one real ClickUp calls on this machine use
+        "CLICKUP_RATE_LIMIT_PATH": os.path.join(work_dir, "rate-limit.json"),
+        # The scripts pace themselves to the fake's quota, or not at all when it has none
+        "CLICKUP_RATE_LIMIT": str(fake.rate_limit * 60 / fake.window),
+        "CLICKUP_RATE_LIMIT_BURST": str(fake.rate_limit),
+    })
+    env.update(extra_env)
+
+    fake.reset_counters()
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable] + args + ["--trace", trace_file], cwd=repo, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall_time = time.perf_counter() - start
+    if proc.returncode != 0:
+        print(f"{name} exited with {proc.returncode}:\n{proc.stderr}", file=sys.stderr)
+
+    subprocesses = 0
+    if os.path.exists(subprocess_log):
+        with open(subprocess_log) as file:
+            subprocesses = sum(int(line) for line in file if line.strip())
+        os.remove(subprocess_log)
+
+    return PhaseResult(name, wall_time, subprocesses, fake.request_count, fake.throttled_count, proc.returncode,
+                       read_span_totals(trace_file))
+
+
+def read_span_totals(trace_file: str) -> dict[str, float]:
+    if not os.path.exists(trace_file):
+        return {}
+    with open(trace_file) as file:
+        events = json.load(file)["traceEvents"]
+    os.remove(trace_file)
+
+    totals = {}
+    for event in events:
+        totals[event["cat"]] = totals.get(event["cat"], 0.0) + event["dur"] / 1e6
+    return totals
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    previous = {phase["name"]: phase for phase in baseline["phases"]}
+    regressions = []
+    for phase in results["phases"]:
+        before = previous.get(phase["name"])
+        if before is None:
+            continue
+        for key in ["wall_time", "subprocesses", "http_requests"]:
+            if phase[key] > before[key] * (1 + tolerance) and phase[key] - before[key] > 0.01:
+                regressions.append(f"{phase['name']}: {key} {before[key]} -> {phase[key]}")
+    return regressions
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='bench',
+        description='Time the release scripts against a synthetic repository and a stand-in ClickUp API',
+    )
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--releases", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--task-refs", type=int, default=150, help="Number of distinct task ids referenced")
+    parser.add_argument("--false-positive-ratio", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every ClickUp response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="ClickUp requests per window, 0 for unlimited")
+    parser.add_argument("--window", type=float, default=60.0, help="Rate-limit window in seconds")
+    parser.add_argument("--repeat", type=int, default=1, help="Run every entry point this many times")
+    parser.add_argument("--list-tasks", type=int, default=20, help="Number of ids passed to list_tasks_in_md.py")
+    parser.add_argument("--team-id", help="Set CLICKUP_TEAM_ID so that lookups go through the team task listing")
+    parser.add_argument(
+        "--mirror", action="store_true",
+        help="With --team-id, sync a local task mirror first and let every entry point read from it"
+    )
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+    config = RepoConfig(args.commits, args.releases, args.tags, args.task_refs, args.false_positive_ratio)
+    ids = task_ids(config)
+
+    with tempfile.TemporaryDirectory(prefix="release-note-bench-") as work_dir:
+        repo = os.path.join(work_dir, "repo")
+        start = time.perf_counter()
+        create_repo(repo, config)
+        phases = [PhaseResult("create_repo", time.perf_counter() - start)]
+
+        fake = FakeClickUp(set(ids), args.latency, args.rate_limit, args.window).start()
+        extra_env = {"CLICKUP_TEAM_ID": args.team_id} if args.team_id else {}
+        entry_points = []
+        if args.mirror and args.team_id:
+            extra_env["CLICKUP_MIRROR_PATH"] = os.path.join(work_dir, "mirror.sqlite")
+            entry_points.append(("sync_mirror", [os.path.join(SCRIPT_DIR, "clickup.py"), "sync-mirror"]))
+        entry_points += [
+            ("generate_release_note", [os.path.join(SCRIPT_DIR, "generate_release_note.py")]),
+            ("git_pc_release_alpha", [os.path.join(SCRIPT_DIR, "git-pc-release.py"), "alpha", "patch", "-d"]),
+            ("git_pc_release_beta", [os.path.join(SCRIPT_DIR, "git-pc-release.py"), "beta", "patch", "-d"]),
+            ("list_tasks_in_md", [os.path.join(SCRIPT_DIR, "list_tasks_in_md.py")] + ids[:args.list_tasks]),
+        ]
+        try:
+            for run in range(1, args.repeat + 1):
+                for name, entry_args in entry_points:
+                    phase_name = name if args.repeat == 1 else f"{name}#{run}"
+                    phases.append(run_entry_point(phase_name, entry_args, repo, fake, work_dir, extra_env))
+        finally:
+            fake.stop()
+
+    results = {
+        "config": vars(args),
+        "phases": [phase.to_dict() for phase in phases],
+    }
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
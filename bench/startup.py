@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_DIR = os.path.join(os.path.dirname(BENCH_DIR), "script")
+# Commands that do no network work, with the arguments the workflows pass them
+COMMANDS = [
+    ("parse_task_id", ["parse_task_id.py", "CU-abc123_some-branch", "https://app.clickup.com/t/def456"]),
+    ("parse_bot_comment", ["parse_bot_comment.py", "Link to `CU-abc123`, `CU-def456`"]),
+    ("clickup_parse_ids", ["clickup.py", "parse-ids", "CU-abc123_some-branch", "https://app.clickup.com/t/def456"]),
+    ("clickup_parse_comment", ["clickup.py", "parse-comment", "Link to `CU-abc123`, `CU-def456`"]),
+]
+# None of the commands above needs these, importing them only adds to the start-up time
+FORBIDDEN_MODULES = {"requests", "json"}
+
+
+class StartupResult:
+    name: str
+    # Median wall time of a run, and the part of it above starting a bare interpreter
+    wall_time: float
+    overhead: float
+    forbidden_imports: list[str]
+    returncode: int
+
+    def __init__(self, name: str, wall_time: float, overhead: float, forbidden_imports: list[str], returncode: int):
+        self.name = name
+        self.wall_time = wall_time
+        self.overhead = overhead
+        self.forbidden_imports = forbidden_imports
+        self.returncode = returncode
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "wall_time": round(self.wall_time, 4),
+            "overhead": round(self.overhead, 4),
+            "forbidden_imports": self.forbidden_imports,
+            "returncode": self.returncode,
+        }
+
+
+def command_line(args: list[str], zipapp: str | None) -> list[str]:
+    if zipapp:
+        return [sys.executable, zipapp, args[0].removesuffix(".py")] + args[1:]
+    return [sys.executable, os.path.join(SCRIPT_DIR, args[0])] + args[1:]
+
+
+def median_wall_time(command: list[str], runs: int) -> (float, int):
+    times = []
+    returncode = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+        returncode = returncode or proc.returncode
+    return statistics.median(times), returncode
+
+
+def imported_modules(command: list[str]) -> set[str]:
+    # -X importtime lists every module the run imported on stderr, one "import time: self | cumulative | name" each
+    proc = subprocess.run([command[0], "-X", "importtime"] + command[1:], stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, text=True)
+    return {
+        line.rsplit("|", 1)[1].strip() for line in proc.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+
+
+def measure(name: str, args: list[str], zipapp: str | None, runs: int, interpreter_time: float) -> StartupResult:
+    command = command_line(args, zipapp)
+    wall_time, returncode = median_wall_time(command, runs)
+    forbidden = sorted({module.split(".")[0] for module in imported_modules(command)} & FORBIDDEN_MODULES)
+    return StartupResult(name, wall_time, wall_time - interpreter_time, forbidden, returncode)
+
+
+def check(results: list[StartupResult], budget: float) -> list[str]:
+    failures = []
+    for result in results:
+        if result.returncode != 0:
+            failures.append(f"{result.name}: exited with {result.returncode}")
+        if result.overhead > budget:
+            failures.append(f"{result.name}: {result.overhead * 1000:.1f}ms over the interpreter start-up, "
+                            f"the budget is {budget * 1000:.1f}ms")
+        if result.forbidden_imports:
+            failures.append(f"{result.name}: imports {', '.join(result.forbidden_imports)}")
+    return failures
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='startup',
+        description='Time how long the commands without network work take to start, and check them against a budget',
+    )
+    parser.add_argument("--zipapp", help="Run the commands from this archive built by build_zipapp.py instead")
+    parser.add_argument("--runs", type=int, default=10, help="Run every command this many times, the median counts")
+    parser.add_argument(
+        "--budget", type=float, default=0.05,
+        help="Seconds a command may take on top of starting a bare interpreter, which varies too much between "
+             "machines to be part of the budget"
+    )
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+    interpreter_time, _ = median_wall_time([sys.executable, "-c", "pass"], args.runs)
+    results = [measure(name, command_args, args.zipapp, args.runs, interpreter_time)
+               for name, command_args in COMMANDS]
+
+    report = json.dumps({
+        "config": vars(args),
+        "interpreter": round(interpreter_time, 4),
+        "commands": [result.to_dict() for result in results],
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+    else:
+        print(report)
+
+    failures = check(results, args.budget)
+    for failure in failures:
+        print(f"Over budget: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import argparse
+import random
+import subprocess
+
+BASE_TIMESTAMP = 1700000000
+FALSE_POSITIVE_REFERENCES = ["#123", "#4567", "#fff", "#ff00aa", "#hashtag"]
+
+
+class RepoConfig:
+    commits: int
+    releases: int
+    tags: int
+    task_refs: int
+    false_positive_ratio: float
+    seed: int
+
+    def __init__(self, commits: int = 1000, releases: int = 20, tags: int = 100, task_refs: int = 200,
+                 false_positive_ratio: float = 0.5, seed: int = 0):
+        self.commits = commits
+        self.releases = max(2, releases)
+        self.tags = tags
+        self.task_refs = task_refs
+        self.false_positive_ratio = false_positive_ratio
+        self.seed = seed
+
+
+def make_task_id(number: int) -> str:
+    # Same shape as real ClickUp ids: "86" followed by seven base36 characters
+    alphabet = "0123456789abcdefghijklmnopqrstuvwxyz"
+    suffix = ""
+    for _ in range(7):
+        number, remainder = divmod(number, 36)
+        suffix = alphabet[remainder] + suffix
+    return "86" + suffix
+
+
+def task_ids(config: RepoConfig) -> list[str]:
+    return [make_task_id(number + 1) for number in range(config.task_refs)]
+
+
+def commit_message(index: int, config: RepoConfig, rng: random.Random) -> str:
+    if config.task_refs == 0:
+        return f"Change {index}"
+    task_id = make_task_id(rng.randrange(config.task_refs) + 1)
+    message = f"Change {index} #{task_id} {{Dev message {index}}}"
+    if rng.random() < config.false_positive_ratio:
+        message += f" see {rng.choice(FALSE_POSITIVE_REFERENCES)}"
+    return message
+
+
+def fast_import_stream(config: RepoConfig) -> (str, list[str]):
+    rng = random.Random(config.seed)
+    release_every = max(1, config.commits // config.releases)
+    lines = []
+    release_marks = []
+    release_count = 0
+
+    for index in range(1, config.commits + 1):
+        is_release = index % release_every == 0 and release_count < config.releases
+        if is_release:
+            release_count += 1
+            variant = "beta" if release_count % 3 else "all"
+            message = f"build_{variant}_1.{release_count}.0\nSprint release"
+        else:
+            message = commit_message(index, config, rng)
+
+        data = message.encode("utf-8")
+        lines.append("commit refs/heads/main")
+        lines.append(f"mark :{index}")
+        lines.append(f"committer Bench <bench@example.com> {BASE_TIMESTAMP + index * 60} +0000")
+        lines.append(f"data {len(data)}")
+        lines.append(message)
+        if index > 1:
+            lines.append(f"from :{index - 1}")
+        lines.append("")
+        if is_release:
+            release_marks.append(index)
+
+    tag_names = []
+    for number in range(config.tags):
+        mark = release_marks[number % len(release_marks)] if release_marks else config.commits
+        name = f"1.{release_count}.{50 + number}" if number % 2 else f"v1.{number % max(1, release_count) + 1}.{number}"
+        tag_names.append(name)
+        lines.append(f"reset refs/tags/{name}")
+        lines.append(f"from :{mark}")
+        lines.append("")
+
+    for branch in ["release-beta", "dev"]:
+        lines.append(f"reset refs/heads/{branch}")
+        lines.append(f"from :{config.commits}")
+        lines.append("")
+
+    return "\n".join(lines) + "\n", tag_names
+
+
+def create_repo(path: str, config: RepoConfig):
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+    for key, value in [("user.name", "Bench"), ("user.email", "bench@example.com")]:
+        subprocess.run(["git", "config", key, value], cwd=path, check=True)
+
+    stream, _ = fast_import_stream(config)
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input=stream.encode("utf-8"), check=True)
+    subprocess.run(["git", "checkout", "-q", "-f", "dev"], cwd=path, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create a synthetic repository for benchmarks")
+    parser.add_argument("path", help="Where to create the repository")
+    parser.add_argument("--commits", type=int, default=1000)
+    parser.add_argument("--releases", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=100)
+    parser.add_argument("--task-refs", type=int, default=200, help="Number of distinct task ids referenced")
+    parser.add_argument("--false-positive-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    create_repo(args.path, RepoConfig(
+        args.commits, args.releases, args.tags, args.task_refs, args.false_positive_ratio, args.seed
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import os
+import threading
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+CASSETTE_VERSION = 1
+RECORD = "record"
+REPLAY = "replay"
+# Only the headers the client logic looks at are kept, never anything that identifies the caller
+RECORDED_HEADERS = ["Content-Type", "Retry-After", "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"]
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def request_key(method: str, url: str, body: str | bytes | None) -> str:
+    parsed = urlparse(url)
+    path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    return f"{method.upper()} {path} {body or ''}"
+
+
+class Cassette:
+    path: str
+    mode: str
+
+    def __init__(self, path: str, mode: str):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode {mode}, expected {RECORD} or {REPLAY}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        # Request key to recorded responses; replay serves them in order and repeats the last one
+        self._interactions: dict[str, list[dict]] = {}
+        self._replay_positions: dict[str, int] = {}
+        if mode == REPLAY or os.path.exists(path):
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self):
+        with self._open("r") as file:
+            data = json.load(file)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}")
+        self._interactions = data["interactions"]
+
+    def save(self):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._open("w") as file:
+                json.dump({"version": CASSETTE_VERSION, "interactions": self._interactions}, file,
+                          separators=(",", ":"), sort_keys=True)
+
+    # resp is None for a request that never got a response, which replays as a connection error
+    def record(self, method: str, url: str, body: str | bytes | None, resp: requests.Response | None):
+        if resp is None:
+            interaction = {"status": None, "headers": {}, "body": ""}
+        else:
+            interaction = {
+                "status": resp.status_code,
+                "headers": {key: resp.headers[key] for key in RECORDED_HEADERS if key in resp.headers},
+                "body": resp.text,
+            }
+        key = request_key(method, url, body)
+        with self._lock:
+            if key not in self._replay_positions:
+                # A new recording session replaces what an older one stored for the same request
+                self._interactions[key] = []
+                self._replay_positions[key] = 0
+            self._interactions[key].append(interaction)
+
+    def replay(self, method: str, url: str, body: str | bytes | None) -> requests.Response:
+        key = request_key(method, url, body)
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise CassetteMiss(f"No recorded response for {key.strip()} in {self.path}")
+            position = self._replay_positions.get(key, 0)
+            self._replay_positions[key] = position + 1
+            interaction = interactions[min(position, len(interactions) - 1)]
+
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        if interaction["status"] is None:
+            raise requests.ConnectionError(f"Recorded connection error for {key.strip()}")
+        resp = requests.Response()
+        resp.status_code = interaction["status"]
+        resp.headers = CaseInsensitiveDict(interaction["headers"])
+        resp._content = interaction["body"].encode("utf-8")
+        resp.encoding = "utf-8"
+        resp.url = url
+        return resp
+
+
+_cassette: Cassette | None = None
+_cassette_lock = threading.Lock()
+
+
+# The cassette configured through CLICKUP_CASSETTE and CLICKUP_CASSETTE_MODE, or None
+def get_cassette() -> Cassette | None:
+    global _cassette
+    path = os.environ.get("CLICKUP_CASSETTE")
+    if not path:
+        return None
+
+    with _cassette_lock:
+        if _cassette is None or _cassette.path != path:
+            _cassette = Cassette(path, os.environ.get("CLICKUP_CASSETTE_MODE", REPLAY))
+            if _cassette.recording:
+                atexit.register(_cassette.save)
+        return _cassette
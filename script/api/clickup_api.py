@@ -1,22 +1,213 @@
 from __future__ import annotations
 
-import requests
 import json
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse, urlencode
+
+from api import http
+from api.cassette import get_cassette
+from api.rate_limit import get_rate_limiter, RateLimiter
+from api.task_cache import get_task_cache, MISS_STATUS_CODES
+from api.task_mirror import get_task_mirror, TaskMirror
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_CONCURRENCY = 8
+# The filtered team task listing returns up to 100 tasks per page
+DEFAULT_MAX_BULK_PAGES = 10
+DEFAULT_MAX_SYNC_PAGES = 1000
+
+class ClickUpError(Exception):
+    pass
 
 
 def get_clickup_token() -> str:
+    cassette = get_cassette()
+    if cassette and cassette.replaying:
+        return os.environ.get("CLICKUP_TOKEN", "")
     return os.environ["CLICKUP_TOKEN"]
 
 
+def get_clickup_team_id() -> str | None:
+    return os.environ.get("CLICKUP_TEAM_ID")
+
+
+def get_clickup_api_url() -> str:
+    return os.environ.get("CLICKUP_API_URL", "https://api.clickup.com/api/v2").rstrip("/")
+
+
+def get_span_name(method: str, url: str) -> str:
+    # Task and team ids are replaced so that the summary groups requests by endpoint
+    path = urlparse(url).path
+    path = re.sub(r'/team/[^/]+', '/team/{id}', path)
+    return f"{method} {re.sub(r'/task/[^/]+', '/task/{id}', path)}"
+
+
+# The limiter every ClickUp request goes through, None when replaying a cassette
+def get_request_rate_limiter() -> RateLimiter | None:
+    cassette = get_cassette()
+    if cassette and cassette.replaying:
+        return None
+    return get_rate_limiter(os.environ.get("CLICKUP_TOKEN", ""))
+
+
+# A ClickUp request, which goes through the token's rate limiter and the cassette when there is one
+def send_request(method: str, url: str, **kwargs) -> (requests.Response | None, int):
+    return http.send_request(method, url, name=get_span_name(method, url), limiter=get_request_rate_limiter(),
+                             cassette=get_cassette(), **kwargs)
+
+
+def get_mirrored_tasks(task_ids: list[str]) -> dict[str, dict]:
+    mirror = get_task_mirror()
+    cassette = get_cassette()
+    if not mirror or (cassette and cassette.recording):
+        return {}
+    found = mirror.lookup(task_ids)
+    # Cached results are checked against the task cache, so it has to know about mirrored tasks too. Where
+    # it holds a task as updated or later, its fuller body wins over the mirror's
+    cache = get_task_cache()
+    if cache and found:
+        found = cache.merge(found)
+    return found
+
+
 def get_clickup_task(task_id: str) -> dict | None:
-    resp = requests.get(
-        f'https://api.clickup.com/api/v2/task/{task_id}',
+    mirrored = get_mirrored_tasks([task_id])
+    if task_id in mirrored:
+        return mirrored[task_id]
+
+    cache = get_task_cache()
+    cassette = get_cassette()
+    # While recording every lookup has to reach the API, otherwise the cassette misses it
+    if cache and not (cassette and cassette.recording):
+        hit, task = cache.get(task_id)
+        if hit:
+            return task
+
+    resp, _ = send_request(
+        "GET",
+        f'{get_clickup_api_url()}/task/{task_id}',
         headers={
             "Authorization": get_clickup_token()
         }
     )
-    if resp.status_code != 200:
+    if resp is None or resp.status_code != 200:
+        if cache and resp is not None and resp.status_code in MISS_STATUS_CODES:
+            cache.put_miss(task_id)
         return None
 
-    return json.loads(resp.text)
+    task = json.loads(resp.text)
+    if cache:
+        cache.put(task_id, task)
+    return task
+
+
+def get_clickup_tasks(task_ids: list[str], concurrency: int = DEFAULT_CONCURRENCY) -> dict[str, dict | None]:
+    unique_ids = list(dict.fromkeys(task_ids))
+    if not unique_ids:
+        return {}
+
+    workers = max(1, min(concurrency, len(unique_ids)))
+    http.reserve_connections(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(get_clickup_task, unique_ids)
+        # executor.map yields in submission order, so the result stays deterministic
+        return dict(zip(unique_ids, results))
+
+
+def get_team_task_page(team_id: str, page: int, updated_since: datetime | None = None,
+                       newest_first: bool = True) -> (list[dict] | None, bool):
+    # Returns (tasks, last page), with tasks None when the page could not be read
+    params = [
+        ("page", page),
+        ("order_by", "updated"),
+        ("reverse", "true" if newest_first else "false"),
+        ("subtasks", "true"),
+        ("include_closed", "true"),
+    ]
+    if updated_since:
+        params.append(("date_updated_gt", int(updated_since.timestamp() * 1000)))
+    # The query goes into the URL itself so that cassettes key on it
+    resp, _ = send_request(
+        "GET",
+        f'{get_clickup_api_url()}/team/{team_id}/task?{urlencode(params)}',
+        headers={
+            "Authorization": get_clickup_token()
+        }
+    )
+    if resp is None or resp.status_code != 200:
+        return None, True
+
+    body = json.loads(resp.text)
+    tasks = body.get("tasks", [])
+    return tasks, body.get("last_page", len(tasks) == 0)
+
+
+def bulk_get_clickup_tasks(task_ids: list[str], concurrency: int = DEFAULT_CONCURRENCY,
+                           updated_since: datetime | None = None,
+                           max_pages: int = DEFAULT_MAX_BULK_PAGES) -> dict[str, dict | None]:
+    unique_ids = list(dict.fromkeys(task_ids))
+    found = get_mirrored_tasks(unique_ids)
+
+    cache = get_task_cache()
+    cassette = get_cassette()
+    if cache and not (cassette and cassette.recording):
+        for task_id in unique_ids:
+            if task_id in found:
+                continue
+            hit, task = cache.get(task_id)
+            if hit:
+                found[task_id] = task
+
+    # Pages through the team's recently updated tasks and picks out the wanted ids, by id or custom id.
+    # Without updated_since the listing can take up to max_pages requests before finding anything, which
+    # only pays off for more ids than that
+    team_id = get_clickup_team_id()
+    wanted = set(unique_ids) - set(found)
+    use_listing = team_id and (updated_since or len(wanted) > max_pages)
+    page = 0
+    while use_listing and wanted and page < max_pages:
+        tasks, last_page = get_team_task_page(team_id, page, updated_since)
+        for task in tasks or []:
+            for task_id in [task.get("id"), task.get("custom_id")]:
+                if task_id in wanted:
+                    wanted.discard(task_id)
+                    found[task_id] = task
+                    if cache:
+                        cache.put(task_id, task)
+        if last_page:
+            break
+        page += 1
+
+    # Only ids the listing did not return are looked up one by one
+    missing = [task_id for task_id in unique_ids if task_id not in found]
+    found.update(get_clickup_tasks(missing, concurrency))
+    return {task_id: found[task_id] for task_id in unique_ids}
+
+
+def sync_task_mirror(mirror: TaskMirror, team_id: str, full: bool = False,
+                     max_pages: int = DEFAULT_MAX_SYNC_PAGES) -> int:
+    # Pages through the tasks updated since the newest one in the mirror, oldest first, so that
+    # a sync cut short still leaves a high-water mark the next one can continue from
+    started_at = time.time()
+    high_water = None if full else mirror.high_water()
+    # date_updated_gt is exclusive, and tasks updated in the same millisecond must not be skipped
+    updated_since = datetime.fromtimestamp((high_water - 1) / 1000, tz=timezone.utc) if high_water else None
+
+    count = 0
+    for page in range(max_pages):
+        tasks, last_page = get_team_task_page(team_id, page, updated_since, newest_first=False)
+        if tasks is None:
+            raise ClickUpError(f"Could not read page {page} of the tasks of team {team_id}")
+        mirror.upsert(tasks)
+        count += len(tasks)
+        if last_page:
+            mirror.mark_synced(started_at)
+            return count
+    raise ClickUpError(f"Stopped syncing after {max_pages} pages, run the sync again to continue")
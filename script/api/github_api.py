@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Iterator
+
+from common.common import run_command
+
+PAGE_SIZE = 100
+MERGED_PULL_REQUESTS_QUERY = """
+query($searchQuery: String!, $pageSize: Int!, $cursor: String) {
+  search(query: $searchQuery, type: ISSUE, first: $pageSize, after: $cursor) {
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    nodes {
+      ... on PullRequest {
+        number
+        body
+        baseRefName
+        headRefName
+      }
+    }
+  }
+}
+"""
+
+
+def get_repository_name(verbose: bool = False) -> str:
+    if os.environ.get("GITHUB_REPOSITORY"):
+        return os.environ["GITHUB_REPOSITORY"]
+    return run_command(["gh", "repo", "view", "--json", "nameWithOwner", "-q", ".nameWithOwner"],
+                       verbose=verbose).strip()
+
+
+def iter_merged_pull_requests(start: str, end: str, verbose: bool = False) -> Iterator[dict]:
+    # Follows the search cursor page by page, so nothing past the first page is dropped
+    search_query = f"repo:{get_repository_name(verbose)} is:pr is:merged merged:{start}..{end}"
+    cursor = None
+    while True:
+        command = [
+            "gh", "api", "graphql",
+            "-f", f"query={MERGED_PULL_REQUESTS_QUERY}",
+            "-f", f"searchQuery={search_query}",
+            "-F", f"pageSize={PAGE_SIZE}",
+        ]
+        if cursor:
+            command += ["-f", f"cursor={cursor}"]
+        search = json.loads(run_command(command, verbose=verbose))["data"]["search"]
+
+        for node in search["nodes"]:
+            if node:
+                yield node
+
+        if not search["pageInfo"]["hasNextPage"]:
+            return
+        cursor = search["pageInfo"]["endCursor"]
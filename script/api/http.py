@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from common import trace
+
+if TYPE_CHECKING:
+    import requests
+
+    from api.cassette import Cassette
+    from api.rate_limit import RateLimiter
+
+MAX_ATTEMPTS = 5
+MAX_RETRY_DELAY = 60.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Seconds to connect and between bytes of the answer; without it a stalled connection blocks forever
+# and is never retried
+REQUEST_TIMEOUT = 30
+# Connections kept per host unless more threads reserve their own, the same as requests' default
+DEFAULT_POOL_SIZE = 10
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+_mounted_pool_size = 0
+
+
+# Makes room in the shared pool for count threads sending requests at the same time, so that none of their
+# connections is thrown away after use
+def reserve_connections(count: int):
+    global _pool_size
+    with _session_lock:
+        _pool_size = max(_pool_size, count)
+
+
+def get_session() -> requests.Session:
+    # A single keep-alive session shared by every thread, sized so that each worker keeps its own connection
+    global _session, _mounted_pool_size
+    # Imported on first use, so that runs answered from the caches never pay for loading requests
+    import requests
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        if _mounted_pool_size < _pool_size:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _mounted_pool_size = _pool_size
+        return _session
+
+
+def get_retry_delay(resp: requests.Response | None, attempt: int) -> float:
+    backoff = min(MAX_RETRY_DELAY, 0.5 * 2 ** attempt)
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        rate_limit_reset = resp.headers.get("X-RateLimit-Reset")
+        try:
+            if retry_after is not None:
+                backoff = float(retry_after)
+            elif rate_limit_reset is not None:
+                backoff = float(rate_limit_reset) - time.time()
+        except ValueError:
+            pass
+        backoff = min(MAX_RETRY_DELAY, max(0.0, backoff))
+    # Jitter spreads out the workers that were throttled together
+    return backoff + random.uniform(0, max(0.1, backoff * 0.25))
+
+
+# Sends the request until it gets an answer that is not worth retrying or runs out of attempts, and returns
+# (response or None, attempts). name labels its trace spans and traced_url is the url they keep, the path
+# and the url itself unless given. idempotent=False only retries answers the server marks as retryable,
+# never a request that may have reached it before the connection failed
+def send_request(method: str, url: str, name: str | None = None, traced_url: str | None = None,
+                 limiter: RateLimiter | None = None, cassette: Cassette | None = None, idempotent: bool = True,
+                 **kwargs) -> (requests.Response | None, int):
+    import requests
+
+    name = name or f"{method} {urlparse(url).path}"
+    traced_url = traced_url or url
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    attempt = 0
+    while True:
+        attempt += 1
+        # Concurrent jobs share the token's quota, so requests queue here instead of running into 429s
+        while limiter and (delay := limiter.take()) > 0:
+            with trace.span("rate limit wait", "http", url=traced_url, attempt=attempt, delay=round(delay, 3)):
+                time.sleep(delay)
+        with trace.span(name, "http", url=traced_url, attempt=attempt) as details:
+            try:
+                if cassette and cassette.replaying:
+                    resp = cassette.replay(method, url, kwargs.get("data"))
+                else:
+                    resp = get_session().request(method, url, **kwargs)
+                details["status"] = resp.status_code
+                if limiter:
+                    limiter.observe(resp.headers, throttled=resp.status_code == 429)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                resp = None
+                details["error"] = type(error).__name__
+                # A connect timeout is the one failure that is known to have sent nothing
+                unsent = isinstance(error, requests.ConnectTimeout)
+
+        if resp is None:
+            final = attempt >= MAX_ATTEMPTS or not (idempotent or unsent)
+        else:
+            final = resp.status_code not in RETRY_STATUS_CODES or attempt >= MAX_ATTEMPTS
+        if cassette and cassette.replaying:
+            # Only the answer a request ended with is recorded, so a replay never retries or waits
+            return resp, attempt
+        if final:
+            # Including a failure after the last attempt, so that its replay fails the same way
+            if cassette and cassette.recording:
+                cassette.record(method, url, kwargs.get("data"), resp)
+            return resp, attempt
+        if limiter and resp is not None and resp.status_code == 429:
+            # The limiter already holds the next attempt back until the quota resets
+            continue
+        delay = get_retry_delay(resp, attempt)
+        with trace.span("retry wait", "http", url=traced_url, attempt=attempt, delay=round(delay, 3)):
+            time.sleep(delay)
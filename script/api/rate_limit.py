@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Mapping
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows) the limit is only shared between the threads of one process
+    fcntl = None
+
+# ClickUp allows 100 requests per minute and token on its smallest plan
+DEFAULT_REQUESTS_PER_MINUTE = 100
+# A throttled response never blocks for longer than one rate-limit window, whatever the server clock says
+MAX_BLOCK = 60.0
+
+
+class RateLimiter:
+    path: str
+    rate: float
+    burst: float
+
+    # rate is in requests per second, burst the number of requests that may go out back to back
+    def __init__(self, path: str, rate: float, burst: float):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # Runs update(tokens, updated_at) -> (tokens, updated_at, result) on the state every process shares
+    def _transact(self, update):
+        with self._lock:
+            descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl:
+                    fcntl.flock(descriptor, fcntl.LOCK_EX)
+                data = b""
+                while chunk := os.read(descriptor, 4096):
+                    data += chunk
+                try:
+                    state = json.loads(data)
+                    tokens, updated_at = float(state["tokens"]), float(state["updated_at"])
+                except (ValueError, KeyError, TypeError):
+                    # A new or unreadable state starts with a full bucket
+                    tokens, updated_at = self.burst, 0.0
+
+                tokens, updated_at, result = update(tokens, updated_at)
+                os.lseek(descriptor, 0, os.SEEK_SET)
+                os.ftruncate(descriptor, 0)
+                os.write(descriptor, json.dumps({"tokens": tokens, "updated_at": updated_at}).encode("utf-8"))
+                return result
+            finally:
+                # Closing the descriptor releases the flock
+                os.close(descriptor)
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> (float, float):
+        # updated_at lies in the future while the server has us blocked, nothing refills until then
+        if now > updated_at:
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            updated_at = now
+        return tokens, updated_at
+
+    # Takes a token and returns 0, or returns how many seconds to wait before trying again. Nothing is
+    # reserved while waiting, so a quota the server reported in the meantime still holds the caller back
+    def take(self) -> float:
+        def update(tokens: float, updated_at: float):
+            now = time.time()
+            tokens, updated_at = self._refill(tokens, updated_at, now)
+            if now >= updated_at and tokens >= 1:
+                return tokens - 1, updated_at, 0.0
+            return tokens, updated_at, max(0.0, updated_at - now) + max(0.0, 1 - tokens) / self.rate
+
+        return self._transact(update)
+
+    # Folds the quota the server reports into the shared state, so that requests sent from other hosts
+    # with the same token count too
+    def observe(self, headers: Mapping[str, str], throttled: bool = False):
+        try:
+            remaining = float(headers["X-RateLimit-Remaining"]) if "X-RateLimit-Remaining" in headers else None
+            reset = float(headers["X-RateLimit-Reset"]) if "X-RateLimit-Reset" in headers else None
+        except ValueError:
+            return
+        if throttled:
+            remaining = 0.0
+        if remaining is None:
+            return
+
+        def update(tokens: float, updated_at: float):
+            now = time.time()
+            tokens, updated_at = self._refill(tokens, updated_at, now)
+            tokens = min(tokens, remaining)
+            if remaining <= 0:
+                # Nothing is left until the window resets, so the bucket only starts refilling then
+                blocked_until = min(now + MAX_BLOCK, reset) if reset is not None else now + MAX_BLOCK
+                updated_at = max(updated_at, blocked_until)
+            return tokens, updated_at, None
+
+        self._transact(update)
+
+
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limit_path(token: str) -> str:
+    path = os.environ.get("CLICKUP_RATE_LIMIT_PATH")
+    if path:
+        return path
+    # The limit applies per token, so processes using different tokens don't hold each other up
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"clickup-rate-limit-{digest}.json")
+
+
+# The limiter shared by every process using the same token on this host, or None when
+# CLICKUP_RATE_LIMIT is 0
+def get_rate_limiter(token: str) -> RateLimiter | None:
+    global _limiter
+    requests_per_minute = float(os.environ.get("CLICKUP_RATE_LIMIT", DEFAULT_REQUESTS_PER_MINUTE))
+    if requests_per_minute <= 0:
+        return None
+    rate = requests_per_minute / 60
+    burst = max(1.0, float(os.environ.get("CLICKUP_RATE_LIMIT_BURST", requests_per_minute)))
+    path = get_rate_limit_path(token)
+
+    with _limiter_lock:
+        if _limiter is None or (_limiter.path, _limiter.rate, _limiter.burst) != (path, rate, burst):
+            _limiter = RateLimiter(path, rate, burst)
+        return _limiter
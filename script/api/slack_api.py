@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import os
+from urllib.parse import urlparse
+
+from api.http import send_request
+from build_release_notes import MAX_BLOCKS_PER_MESSAGE
+
+
+class SlackError(Exception):
+    pass
+
+
+def get_slack_api_url() -> str:
+    return os.environ.get("SLACK_API_URL", "https://slack.com/api").rstrip("/")
+
+
+def get_slack_webhook_url() -> str | None:
+    return os.environ.get("SLACK_WEBHOOK_URL") or None
+
+
+def get_slack_bot_token() -> str | None:
+    return os.environ.get("SLACK_BOT_TOKEN") or None
+
+
+def get_slack_channel() -> str | None:
+    return os.environ.get("SLACK_CHANNEL") or None
+
+
+def split_message(message: dict) -> list[dict]:
+    # Payloads built elsewhere may carry more blocks than a single message can hold
+    blocks = message.get("blocks") or []
+    if len(blocks) <= MAX_BLOCKS_PER_MESSAGE:
+        return [message]
+    return [
+        dict(message, blocks=blocks[i:i + MAX_BLOCKS_PER_MESSAGE])
+        for i in range(0, len(blocks), MAX_BLOCKS_PER_MESSAGE)
+    ]
+
+
+def get_traced_url(url: str) -> str:
+    # The path of a webhook url is its secret, so traces only keep the endpoint of those
+    parsed = urlparse(url)
+    if parsed.path.startswith("/services/"):
+        return f"{parsed.scheme}://{parsed.netloc}/services/{{webhook}}"
+    return url
+
+
+def post_json(url: str, payload: dict, headers: dict | None = None) -> str:
+    traced_url = get_traced_url(url)
+    resp, attempts = send_request(
+        "POST",
+        url,
+        name=f"POST {urlparse(traced_url).path}",
+        traced_url=traced_url,
+        # Slack posts a message again when it is sent again, so only its 429 and 5xx answers are retried
+        idempotent=False,
+        data=json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+        headers={"Content-Type": "application/json; charset=utf-8", **(headers or {})},
+    )
+    if resp is None:
+        raise SlackError(f"Slack could not be reached after {attempts} attempts")
+    if resp.status_code != 200:
+        raise SlackError(f"Slack answered {resp.status_code} after {attempts} attempts: {resp.text.strip()}")
+    return resp.text
+
+
+def post_webhook_message(webhook_url: str, message: dict):
+    post_json(webhook_url, message)
+
+
+def post_chat_message(token: str, channel: str, message: dict, thread_ts: str | None = None) -> str:
+    payload = dict(message, channel=channel)
+    if thread_ts:
+        payload["thread_ts"] = thread_ts
+    body = json.loads(post_json(f"{get_slack_api_url()}/chat.postMessage", payload,
+                                {"Authorization": f"Bearer {token}"}))
+    if not body.get("ok"):
+        raise SlackError(f"chat.postMessage failed: {body.get('error', 'unknown error')}")
+    return body["ts"]
+
+
+def post_messages(messages: list[dict], thread: bool = False) -> int:
+    # Messages are posted one after the other so that they show up in order. With a bot token,
+    # thread=True posts every message after the first as a reply to it; webhooks cannot thread.
+    messages = [part for message in messages for part in split_message(message)]
+    token = get_slack_bot_token()
+    channel = get_slack_channel()
+    webhook_url = get_slack_webhook_url()
+
+    if token and channel:
+        thread_ts = None
+        for message in messages:
+            ts = post_chat_message(token, channel, message, thread_ts)
+            if thread and thread_ts is None:
+                thread_ts = ts
+    elif webhook_url:
+        for message in messages:
+            post_webhook_message(webhook_url, message)
+    else:
+        raise SlackError("Set SLACK_WEBHOOK_URL, or SLACK_BOT_TOKEN and SLACK_CHANNEL")
+    return len(messages)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_NEGATIVE_TTL = 10 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+# Status codes ClickUp answers with when the id is not a task we can read
+MISS_STATUS_CODES = (400, 404)
+
+
+def get_date_updated(task: dict) -> int:
+    # ClickUp sends the millisecond timestamp as a string
+    try:
+        return int(task.get("date_updated") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class TaskCache:
+    path: str
+    ttl: float
+    negative_ttl: float
+    max_entries: int
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id TEXT PRIMARY KEY, body TEXT, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_accessed_at ON tasks (accessed_at)")
+        # Which ids turned out to be tasks or not. Unlike cached bodies valid ids never expire, while invalid ones
+        # do after negative_ttl like cached misses, as a task may not have been readable yet
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS known_ids ("
+            "id TEXT PRIMARY KEY, valid INTEGER NOT NULL, stored_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(known_ids)")]
+        if "stored_at" not in columns:
+            # Caches written before invalid ids expired; their invalid ids count as expired
+            self._connection.execute("ALTER TABLE known_ids ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS known_ids_stored_at ON known_ids (stored_at)")
+        self._connection.commit()
+
+    # Returns (hit, task); a hit with task None means the id is a cached miss
+    def get(self, task_id: str) -> (bool, dict | None):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, stored_at FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return False, None
+
+            body, stored_at = row
+            ttl = self.ttl if body is not None else self.negative_ttl
+            # Expired rows stay until they are replaced, so put() can still tell whether the task changed
+            if now - stored_at > ttl:
+                return False, None
+
+            self._connection.execute("UPDATE tasks SET accessed_at = ? WHERE id = ?", (now, task_id))
+            self._connection.commit()
+        return True, json.loads(body) if body is not None else None
+
+    def put(self, task_id: str, task: dict | None):
+        now = time.time()
+        body = json.dumps(task, sort_keys=True) if task is not None else None
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tasks (id, body, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (task_id, body, now, now)
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO known_ids (id, valid, stored_at) VALUES (?, ?, ?)",
+                (task_id, int(body is not None), now)
+            )
+            self._evict()
+            self._connection.commit()
+
+    def put_miss(self, task_id: str):
+        self.put(task_id, None)
+
+    # Stores the tasks unless the cache already holds them as updated or later, and returns what it holds
+    # for them afterwards. A body with the same date_updated is confirmed current and counts as stored now
+    def merge(self, tasks: dict[str, dict]) -> dict[str, dict]:
+        now = time.time()
+        merged = {}
+        with self._lock:
+            for task_id, task in tasks.items():
+                row = self._connection.execute("SELECT body FROM tasks WHERE id = ?", (task_id,)).fetchone()
+                cached = json.loads(row[0]) if row and row[0] is not None else None
+                if cached is not None and get_date_updated(cached) >= get_date_updated(task):
+                    if get_date_updated(cached) == get_date_updated(task):
+                        self._connection.execute(
+                            "UPDATE tasks SET stored_at = ?, accessed_at = ? WHERE id = ?", (now, now, task_id)
+                        )
+                    merged[task_id] = cached
+                    continue
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO tasks (id, body, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (task_id, json.dumps(task, sort_keys=True), now, now)
+                )
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO known_ids (id, valid, stored_at) VALUES (?, 1, ?)", (task_id, now)
+                )
+                merged[task_id] = task
+            self._evict()
+            self._connection.commit()
+        return merged
+
+    # Returns (known valid ids, known invalid ids) among the given ones
+    def known_ids(self, task_ids: list[str]) -> (set[str], set[str]):
+        now = time.time()
+        valid = set()
+        invalid = set()
+        with self._lock:
+            for task_id in set(task_ids):
+                row = self._connection.execute(
+                    "SELECT valid, stored_at FROM known_ids WHERE id = ?", (task_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                if row[0]:
+                    valid.add(task_id)
+                elif now - row[1] <= self.negative_ttl:
+                    invalid.add(task_id)
+        return valid, invalid
+
+    # A digest of what is cached for the ids, or None when one of them is not cached or has expired, so that
+    # results rendered from them are checked against ClickUp again
+    def fingerprint(self, task_ids: list[str]) -> str | None:
+        now = time.time()
+        digest = hashlib.sha256()
+        with self._lock:
+            for task_id in sorted(set(task_ids)):
+                row = self._connection.execute(
+                    "SELECT body, stored_at FROM tasks WHERE id = ?", (task_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                body, stored_at = row
+                if now - stored_at > (self.ttl if body is not None else self.negative_ttl):
+                    return None
+                digest.update(f"{task_id}\0{body or ''}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _evict(self):
+        # Least recently used entries go first once the cache grows past its cap
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM tasks").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._connection.execute(
+                "DELETE FROM tasks WHERE id IN (SELECT id FROM tasks ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+        # Known ids are kept up to the same cap, the ones stored longest ago go first
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM known_ids").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._connection.execute(
+                "DELETE FROM known_ids WHERE id IN (SELECT id FROM known_ids ORDER BY stored_at LIMIT ?)",
+                (overflow,)
+            )
+
+
+_cache: TaskCache | None = None
+_cache_lock = threading.Lock()
+
+
+# The cache configured through CLICKUP_CACHE_PATH, or None when caching is disabled
+def get_task_cache() -> TaskCache | None:
+    global _cache
+    path = os.environ.get("CLICKUP_CACHE_PATH")
+    if not path:
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            _cache = TaskCache(
+                path,
+                ttl=float(os.environ.get("CLICKUP_CACHE_TTL", DEFAULT_TTL)),
+                negative_ttl=float(os.environ.get("CLICKUP_CACHE_NEGATIVE_TTL", DEFAULT_NEGATIVE_TTL)),
+                max_entries=int(os.environ.get("CLICKUP_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _cache
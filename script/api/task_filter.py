@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import re
+import sys
+
+from api.task_cache import get_task_cache
+from api.task_mirror import get_task_mirror
+
+# ClickUp task ids are short lowercase base36 strings such as 86abc1234. Both a digit and a letter are
+# required: pure numbers are GitHub issue references and pure words are hashtags. An id that happens to be
+# all digits is only kept once the task cache or the mirror knows it
+TASK_ID_SHAPE = re.compile(r'^(?=[0-9a-z]*[0-9])(?=[0-9a-z]*[a-z])[0-9a-z]{6,12}$')
+
+
+def has_task_id_shape(candidate: str) -> bool:
+    return bool(TASK_ID_SHAPE.match(candidate))
+
+
+def filter_task_candidates(candidates: list[str]) -> (list[str], int):
+    # Ids seen before are decided by what ClickUp answered back then, new ones by their shape
+    known_valid, known_invalid = set(), set()
+    cache = get_task_cache()
+    if cache:
+        known_valid, known_invalid = cache.known_ids(candidates)
+    mirror = get_task_mirror()
+    if mirror:
+        known_valid |= set(mirror.lookup(candidates))
+
+    kept = [
+        candidate for candidate in candidates
+        if candidate in known_valid or (candidate not in known_invalid and has_task_id_shape(candidate))
+    ]
+    skipped = len(candidates) - len(kept)
+    if skipped:
+        print(f"Skipped {skipped} of {len(candidates)} task id candidates that are not ClickUp tasks",
+              file=sys.stderr)
+    return kept, skipped
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+
+# A task changed since the last sync is served as it was then, so this is also how out of date a
+# mirrored task may be
+DEFAULT_MAX_AGE = 24 * 60 * 60
+# Stays well below SQLite's limit on bound parameters per statement
+LOOKUP_CHUNK_SIZE = 400
+
+
+def mirror_row(task: dict) -> tuple:
+    status = task.get("status") or {}
+    return (
+        task["id"],
+        task.get("custom_id"),
+        task.get("name", ""),
+        task.get("url", ""),
+        status.get("status") if isinstance(status, dict) else status,
+        int(task.get("date_updated") or 0),
+    )
+
+
+def row_task(row: tuple) -> dict:
+    # The same shape as the API answers with, limited to the fields the scripts read
+    task_id, custom_id, name, url, status, date_updated = row
+    return {
+        "id": task_id,
+        "custom_id": custom_id,
+        "name": name,
+        "url": url,
+        "status": {"status": status},
+        "date_updated": str(date_updated),
+    }
+
+
+class TaskMirror:
+    path: str
+    max_age: float
+
+    def __init__(self, path: str, max_age: float = DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id TEXT PRIMARY KEY, custom_id TEXT, name TEXT NOT NULL, url TEXT NOT NULL, status TEXT, "
+            "date_updated INTEGER NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_custom_id ON tasks (custom_id)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_date_updated ON tasks (date_updated)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+        self._connection.commit()
+
+    def synced_at(self) -> float | None:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self) -> bool:
+        synced_at = self.synced_at()
+        return synced_at is not None and time.time() - synced_at <= self.max_age
+
+    # The newest date_updated in the mirror, in milliseconds; the next sync continues from there
+    def high_water(self) -> int | None:
+        with self._lock:
+            (high_water,) = self._connection.execute("SELECT MAX(date_updated) FROM tasks").fetchone()
+        return high_water
+
+    def count(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM tasks").fetchone()
+        return count
+
+    def upsert(self, tasks: list[dict]):
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO tasks (id, custom_id, name, url, status, date_updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [mirror_row(task) for task in tasks if task.get("id")]
+            )
+            self._connection.commit()
+
+    def mark_synced(self, synced_at: float):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('synced_at', ?)", (synced_at,))
+            self._connection.commit()
+
+    # Tasks found by id or custom id, as of the last sync; a stale mirror answers nothing so that callers
+    # ask the API
+    def lookup(self, task_ids: list[str]) -> dict[str, dict]:
+        wanted = list(dict.fromkeys(task_ids))
+        if not wanted or not self.is_fresh():
+            return {}
+
+        found = {}
+        with self._lock:
+            for i in range(0, len(wanted), LOOKUP_CHUNK_SIZE):
+                chunk = wanted[i:i + LOOKUP_CHUNK_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    "SELECT id, custom_id, name, url, status, date_updated FROM tasks "
+                    f"WHERE id IN ({placeholders}) OR custom_id IN ({placeholders})",
+                    chunk + chunk
+                ).fetchall()
+                chunk_ids = set(chunk)
+                for row in rows:
+                    for task_id in (row[0], row[1]):
+                        if task_id in chunk_ids:
+                            found[task_id] = row_task(row)
+        return found
+
+
+_mirror: TaskMirror | None = None
+_mirror_lock = threading.Lock()
+
+
+# The mirror configured through CLICKUP_MIRROR_PATH, or None when there is none
+def get_task_mirror() -> TaskMirror | None:
+    global _mirror
+    path = os.environ.get("CLICKUP_MIRROR_PATH")
+    if not path:
+        return None
+
+    with _mirror_lock:
+        if _mirror is None or _mirror.path != path:
+            _mirror = TaskMirror(path, max_age=float(os.environ.get("CLICKUP_MIRROR_MAX_AGE", DEFAULT_MAX_AGE)))
+        return _mirror
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+from __future__ import annotations
+
+import argparse
+import sys
+
+from api.clickup_api import bulk_get_clickup_tasks, DEFAULT_CONCURRENCY
+from api.task_filter import filter_task_candidates
+from build_release_notes import DevMessage
+from common import trace
+from common.common import CommandError
+from common.git import run_git, get_commit_url_prefix
+from common.release_draft import update_draft, draft_ref, Draft
+from common.shallow import ensure_merge_base, fetch_depth_args, exist_locally
+from generate_release_note import iter_task_references, collect_task_dev_messages, \
+    parse_clickup_task_id_from_branch_name
+
+
+def commit_parents(commit: str, verbose: bool = False) -> list[str]:
+    # Read from the commit object itself, since git log and rev-list show none for a shallow clone's boundary
+    header = run_git(["cat-file", "commit", commit], verbose=verbose).split("\n\n", 1)[0]
+    return [line.split()[1] for line in header.splitlines() if line.startswith("parent ")]
+
+
+def ensure_commit(commit: str, verbose: bool = False) -> list[str]:
+    # Makes sure the commit and its parents are local and returns the parents. The checkout may be a shallow
+    # clone of a later state of the branch, or have the commit itself as its boundary
+    if not exist_locally([commit], verbose=verbose):
+        run_git(["fetch", "--no-tags"] + fetch_depth_args(verbose=verbose) + ["origin", commit], verbose=verbose)
+    parents = commit_parents(commit, verbose)
+    if parents and not exist_locally(parents, verbose=verbose):
+        run_git(["fetch", "--no-tags", "--depth=2", "origin", commit], verbose=verbose)
+    return parents
+
+
+def collect_merge_references(commit: str, verbose: bool = False) -> dict[str, list[DevMessage]]:
+    # Everything the merge brought in, which for a squash or rebase merge is the commit itself
+    parents = ensure_commit(commit, verbose)
+    if not parents:
+        return {}
+    if len(parents) > 1:
+        ensure_merge_base(f"{commit}^1", f"{commit}^2", verbose=verbose, refs=[commit])
+    return collect_task_dev_messages(iter_task_references(commit, f"{commit}^1"), get_commit_url_prefix())
+
+
+def collect_pull_request_references(base: str, head: str, verbose: bool = False) -> dict[str, list[DevMessage]]:
+    # Every commit of the pull request, which a rebase merge copies onto the branch one by one
+    if not exist_locally([base, head], verbose=verbose):
+        run_git(["fetch", "--no-tags"] + fetch_depth_args(verbose=verbose) + ["origin", base, head], verbose=verbose)
+    ensure_merge_base(base, head, verbose=verbose)
+    return collect_task_dev_messages(iter_task_references(head, base), get_commit_url_prefix())
+
+
+# Returns the number of tasks added, or None when the merge was already in the draft
+def append_merge(commit: str, branch: str, head_branch: str | None, base: str | None, head: str | None,
+                 concurrency: int, verbose: bool) -> int | None:
+    commit = run_git(["rev-parse", "--verify", "--quiet", commit], verbose=verbose).strip() or commit
+    with trace.span("collect task references", "phase"):
+        if base and head:
+            task_dev_messages = collect_pull_request_references(base, head, verbose)
+        else:
+            task_dev_messages = collect_merge_references(commit, verbose)
+    if head_branch and (task_id := parse_clickup_task_id_from_branch_name(head_branch)):
+        task_dev_messages.setdefault(task_id, [])
+
+    task_ids, _ = filter_task_candidates(list(task_dev_messages))
+    with trace.span("fetch tasks", "phase", count=len(task_ids)):
+        tasks = {task_id: task for task_id, task in bulk_get_clickup_tasks(task_ids, concurrency).items() if task}
+
+    added = False
+
+    def add_merge(draft: Draft) -> bool:
+        nonlocal added
+        added = commit not in draft.commits
+        if not added:
+            return False
+        draft.commits.append(commit)
+        for task_id, task in tasks.items():
+            dev_messages = [vars(message) for message in task_dev_messages[task_id]]
+            draft.add_task(task_id, task["name"], task["url"], dev_messages)
+        return True
+
+    with trace.span("update draft", "phase"):
+        update_draft(branch, add_merge, f"Add {commit[:12]} to the release draft", verbose=verbose)
+    return len(tasks) if added else None
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='append_release_draft',
+        description='Add the tasks of a merged pull request to the draft release notes of a branch',
+    )
+    parser.add_argument(
+        "commit", type=str,
+        help="The merge, squash or last rebased commit of the pull request, recorded so that reruns add nothing twice"
+    )
+    parser.add_argument(
+        "--base", type=str,
+        help="Base commit of the pull request; with --head the tasks come from all of its commits instead of "
+             "from what the merge commit brought in, which for a rebase merge is only its last commit"
+    )
+    parser.add_argument("--head", type=str, help="Head commit of the pull request")
+    parser.add_argument(
+        "--branch", type=str, default="dev", help="The branch the pull request was merged into"
+    )
+    parser.add_argument(
+        "--head-branch", type=str, help="Head branch of the pull request, CU-<task-id>_... adds that task too"
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help="Maximum number of ClickUp tasks fetched at the same time"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print executed commands")
+    trace.add_arguments(parser)
+    args = parser.parse_args()
+    if bool(args.base) != bool(args.head):
+        parser.error("--base and --head have to be given together")
+    trace.configure(args)
+    return args
+
+
+def main() -> int:
+    args = get_args()
+    try:
+        count = append_merge(args.commit, args.branch, args.head_branch, args.base, args.head, args.concurrency,
+                             args.verbose)
+    except CommandError as error:
+        print(error, file=sys.stderr)
+        return error.returncode
+    if count is None:
+        print(f"{args.commit} is already in {draft_ref(args.branch)}, nothing added", file=sys.stderr)
+    else:
+        print(f"Added {count} tasks to {draft_ref(args.branch)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,26 @@
+from __future__ import annotations
+
+import json
 import os
 
+# Slack accepts at most 50 blocks per message and 3000 characters per text
+MAX_BLOCKS_PER_MESSAGE = 50
+MAX_TEXT_LENGTH = 3000
+# Bump whenever the rendered output changes, so cached release notes are rebuilt
+RENDERER_VERSION = 3
+
 
 class DevMessage:
     message: str
     commit_hash: str
     url: str
+    author: str
 
-    def __init__(self, message: str):
+    def __init__(self, message: str, commit_hash: str = "", url: str = "", author: str = ""):
         self.message = message
-        # self.commit_hash = commit_hash
-        # self.url = url
+        self.commit_hash = commit_hash
+        self.url = url
+        self.author = author
 
 
 class Task:
@@ -28,131 +39,113 @@ class Task:
 class Release:
     version: str
     tasks: list[Task] = []
+    # Shown before the version when the notes of several apps go out together
+    name: str | None
 
-    def __init__(self, version: str, tasks: list[Task]):
+    def __init__(self, version: str, tasks: list[Task], name: str | None = None):
         self.version = version
         self.tasks = tasks
+        self.name = name
 
 
-def version_block(version: str) -> str:
-    return ("""
-        {
-            "type": "rich_text",
-            "elements": [
-                {
-                    "type": "rich_text_section",
-                    "elements": [
-                        {
-                            "type": "emoji",
-                            "name": "android_robot"
-                        },
-                        {
-                            "type": "text",
-                            "text": " "
-                        },
-                        {
-                            "type": "text",
-                            "text": "${version}",
-                            "style": {
-                                "bold": true
-                            }
-                        }
-                    ]
-                }
-            ]
-        }
-    """
-            .replace("${version}", version))
+def text_element(text: str, bold: bool = False) -> dict:
+    element = {"type": "text", "text": truncate(text)}
+    if bold:
+        element["style"] = {"bold": True}
+    return element
 
 
-def dev_message_element(dev_message: DevMessage) -> str:
-    return ("""
-    {
-        "type": "rich_text_section",
+def link_element(url: str, text: str) -> dict:
+    return {"type": "link", "url": url, "text": truncate(text)}
+
+
+def truncate(text: str) -> str:
+    if len(text) <= MAX_TEXT_LENGTH:
+        return text
+    return text[:MAX_TEXT_LENGTH - 1] + "\u2026"
+
+
+def version_block(version: str, name: str | None = None) -> dict:
+    return {
+        "type": "rich_text",
         "elements": [
             {
-                "type": "text",
-                "text": "${dev_message} ("
-            },
-            {
-                "type": "link",
-                "url": "${url}",
-                "text": "#${commit_hash}"
-            },
-            {
-                "type": "text",
-                "text": ")"
+                "type": "rich_text_section",
+                "elements": [
+                    {"type": "emoji", "name": "android_robot"},
+                    text_element(f" {name} " if name else " "),
+                    text_element(version, bold=True),
+                ]
             }
         ]
     }
-    """
-            .replace("${dev_message}", dev_message.message)
-            .replace("${url}", "https://github.com/")
-            .replace("${commit_hash}", "test123"))
 
 
-def task_element(task: Task) -> str:
-    return ("""
+def dev_message_element(dev_message: DevMessage) -> dict:
+    if not dev_message.url:
+        text = dev_message.message
+        if dev_message.commit_hash:
+            text += f" (#{dev_message.commit_hash[:7]})"
+        return {"type": "rich_text_section", "elements": [text_element(text)]}
+
+    return {
+        "type": "rich_text_section",
+        "elements": [
+            text_element(f"{dev_message.message} ("),
+            link_element(dev_message.url, f"#{dev_message.commit_hash[:7]}"),
+            text_element(")"),
+        ]
+    }
+
+
+def task_element(task: Task) -> dict:
+    elements = [
         {
-            "type": "rich_text",
+            "type": "rich_text_list",
+            "style": "bullet",
+            "indent": 0,
+            "border": 0,
             "elements": [
                 {
-                    "type": "rich_text_list",
-                    "style": "bullet",
-                    "indent": 0,
-                    "border": 0,
-                    "elements": [
-                        {
-                            "type": "rich_text_section",
-                            "elements": [
-                                {
-                                    "type": "text",
-                                    "text": "${title} ["
-                                },
-                                {
-                                    "type": "link",
-                                    "url": "${url}",
-                                    "text": "ClickUp"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "]"
-                                }
-                            ]
-                        }
-                    ]
-                },
-                {
-                    "type": "rich_text_list",
-                    "style": "bullet",
-                    "indent": 1,
-                    "border": 0,
+                    "type": "rich_text_section",
                     "elements": [
-                        ${dev_messages}
+                        text_element(f"{task.title} ["),
+                        link_element(task.url, "ClickUp"),
+                        text_element("]"),
                     ]
                 }
             ]
         }
-    """
-            .replace("${title}", task.title)
-            .replace("${url}", task.url)
-            .replace("${dev_messages}",
-                     ",\n".join([dev_message_element(dev_message) for dev_message in task.dev_messages])))
+    ]
+    # Slack rejects empty lists, so tasks without dev messages only get the title line
+    if task.dev_messages:
+        elements.append({
+            "type": "rich_text_list",
+            "style": "bullet",
+            "indent": 1,
+            "border": 0,
+            "elements": [dev_message_element(dev_message) for dev_message in task.dev_messages]
+        })
+    return {"type": "rich_text", "elements": elements}
+
+
+def release_blocks(release: Release) -> list[dict]:
+    return [version_block(release.version, release.name)] + [task_element(task) for task in release.tasks]
+
 
+def build_slack_payloads(releases: list[Release]) -> list[dict]:
+    blocks = [block for release in releases for block in release_blocks(release)]
+    return [{"blocks": blocks[i:i + MAX_BLOCKS_PER_MESSAGE]} for i in range(0, len(blocks), MAX_BLOCKS_PER_MESSAGE)]
 
+
+# One compact JSON payload per line, each small enough to be posted to Slack on its own
 def build_slack_message(release: Release) -> str:
-    blocks = [version_block(release.version)]
+    return build_combined_slack_message([release])
 
-    for task in release.tasks:
-        blocks.append(task_element(task))
 
-    return """
-        {
-        "blocks": [
-            ${blocks}
-        ]
-    }
-    """.replace("${blocks}", ",\n".join(blocks))
+# The releases of several apps one after the other, split into messages the same way
+def build_combined_slack_message(releases: list[Release]) -> str:
+    return "\n".join(json.dumps(payload, separators=(",", ":")) for payload in build_slack_payloads(releases))
 
 
 # release = Release(
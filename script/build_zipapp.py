@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+from __future__ import annotations
+
+import argparse
+import compileall
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipapp
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(SCRIPT_DIR), "dist", "pc-scripts.pyz")
+PACKAGES = ["api", "common"]
+VENDORED_REQUIREMENTS = ["requests"]
+# Files inside the archive are only ever imported, never run by path
+EXCLUDED_SCRIPTS = [os.path.basename(__file__)]
+EXTENSION_SUFFIXES = (".so", ".pyd", ".dylib")
+
+MAIN_TEMPLATE = '''import runpy
+import sys
+
+COMMANDS = {commands!r}
+
+
+def main():
+    command = sys.argv[1].removesuffix(".py") if len(sys.argv) > 1 else None
+    if command not in COMMANDS:
+        print("usage: " + sys.argv[0] + " COMMAND [ARGS...], where COMMAND is one of " + ", ".join(COMMANDS),
+              file=sys.stderr)
+        sys.exit(2)
+    # The script sees the same argv as when it is run from the script directory
+    sys.argv = [command] + sys.argv[2:]
+    runpy.run_module(command, run_name="__main__", alter_sys=True)
+
+
+main()
+'''
+
+
+def list_scripts() -> list[str]:
+    return sorted(
+        name for name in os.listdir(SCRIPT_DIR)
+        if name.endswith(".py") and name not in EXCLUDED_SCRIPTS
+    )
+
+
+# Returns the names of the scripts, which are the commands of the archive
+def copy_sources(staging: str) -> list[str]:
+    commands = []
+    for name in list_scripts():
+        shutil.copy2(os.path.join(SCRIPT_DIR, name), os.path.join(staging, name))
+        commands.append(name.removesuffix(".py"))
+    for package in PACKAGES:
+        shutil.copytree(os.path.join(SCRIPT_DIR, package), os.path.join(staging, package),
+                        ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+    return commands
+
+
+def vendor_requirements(staging: str, verbose: bool):
+    # Only pure Python wheels, extension modules can't be imported from inside a zip file
+    command = [
+        sys.executable, "-m", "pip", "install", "--target", staging, "--no-compile", "--disable-pip-version-check",
+        "--only-binary=:all:", "--platform", "any", "--implementation", "py",
+    ] + ([] if verbose else ["--quiet"]) + VENDORED_REQUIREMENTS
+    subprocess.run(command, check=True)
+    # Console scripts of the dependencies are of no use inside the archive
+    shutil.rmtree(os.path.join(staging, "bin"), ignore_errors=True)
+
+    extensions = [
+        os.path.relpath(os.path.join(directory, name), staging)
+        for directory, _, names in os.walk(staging) for name in names if name.endswith(EXTENSION_SUFFIXES)
+    ]
+    if extensions:
+        raise RuntimeError(f"Vendored dependencies contain extension modules: {', '.join(extensions)}")
+
+
+def build(output: str, vendor: bool, interpreter: str, verbose: bool):
+    with tempfile.TemporaryDirectory(prefix="pc-scripts-") as staging:
+        commands = copy_sources(staging)
+        if vendor:
+            vendor_requirements(staging, verbose)
+        with open(os.path.join(staging, "__main__.py"), "w") as file:
+            file.write(MAIN_TEMPLATE.format(commands=commands))
+
+        # zipimport can't write bytecode, so it goes into the archive next to every source. Unchecked hashes
+        # skip comparing it against the source on every import; another Python version falls back to the source
+        compileall.compile_dir(staging, quiet=1, legacy=True,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        zipapp.create_archive(staging, output, interpreter=interpreter, compressed=True)
+    if verbose:
+        print(f"Wrote {output} with {', '.join(commands)}", file=sys.stderr)
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Build the scripts and their dependencies into one self-contained zipapp',
+        epilog='''
+########################## EXAMPLES ###########################################
+
+# build dist/pc-scripts.pyz and run a script from it
+build_zipapp.py
+python dist/pc-scripts.pyz clickup parse-ids CU-abc123_some-branch
+
+# build without vendoring requests, for hosts that already have it installed
+build_zipapp.py --no-vendor -o pc-scripts.pyz
+        ''',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="Where to write the archive")
+    parser.add_argument(
+        "--no-vendor", action="store_true",
+        help=f"Leave out {', '.join(VENDORED_REQUIREMENTS)}, the archive then uses the installed ones"
+    )
+    parser.add_argument(
+        "--interpreter", default="/usr/bin/env python3",
+        help="Interpreter of the archive's shebang line, so that it can be run directly"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print what is being built")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+    try:
+        build(args.output, not args.no_vendor, args.interpreter, args.verbose)
+    except (subprocess.CalledProcessError, RuntimeError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
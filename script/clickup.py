@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+
+from common import trace
+from parse_bot_comment import parse_bot_comment
+from parse_task_id import parse_clickup_task_id
+
+LINK_COMMAND = "/link"
+
+
+def parse_branch_task_id(branch_name: str) -> str | None:
+    if branch_name.startswith("CU-"):
+        return re.split('[-_]', branch_name)[1]
+    return None
+
+
+def parse_link_comment(comment: str) -> list[str]:
+    if not comment.startswith(LINK_COMMAND):
+        return []
+    return [parse_clickup_task_id(word) for word in comment[len(LINK_COMMAND):].split()]
+
+
+def collect_task_ids(branch: str | None, comment: str | None) -> list[str]:
+    task_ids = []
+    if branch and (task_id := parse_branch_task_id(branch)):
+        task_ids.append(task_id)
+    if comment:
+        task_ids += parse_link_comment(comment)
+    return list(dict.fromkeys(task_ids))
+
+
+def parse_ids(args: argparse.Namespace) -> int:
+    print(" ".join(dict.fromkeys(parse_clickup_task_id(task_id) for task_id in args.task_ids)))
+    return 0
+
+
+def parse_comment(args: argparse.Namespace) -> int:
+    for task_id in parse_bot_comment(args.bot_comment):
+        print(task_id)
+    return 0
+
+
+# Leaves the concurrency to the ClickUp modules' default unless it was given
+def concurrency_option(args: argparse.Namespace) -> dict:
+    return {"concurrency": args.concurrency} if args.concurrency else {}
+
+
+def update_status(args: argparse.Namespace) -> int:
+    # The ClickUp modules load requests, so only the subcommands that talk to ClickUp import them
+    from update_task_status import update_task_statuses, report
+
+    results = update_task_statuses(args.task_ids, args.status, **concurrency_option(args))
+    report(results)
+    print(" ".join(result.task_id for result in results.values() if result.success))
+    return 0
+
+
+def list_tasks(args: argparse.Namespace) -> int:
+    from api.clickup_api import bulk_get_clickup_tasks
+    from list_tasks_in_md import render_task_list
+
+    tasks = [task for task in bulk_get_clickup_tasks(args.task_ids, **concurrency_option(args)).values() if task]
+    print(render_task_list(tasks))
+    return 0
+
+
+def link_and_update(args: argparse.Namespace) -> int:
+    from list_tasks_in_md import render_task_list
+    from update_task_status import update_task_statuses, report
+
+    task_ids = collect_task_ids(args.branch, args.comment)
+    if not task_ids:
+        print("No task ids found in the branch name or comment", file=sys.stderr)
+        return 0
+
+    results = update_task_statuses(task_ids, args.status, **concurrency_option(args))
+    report(results)
+    # The PUT already answered with the updated task, so there is nothing left to fetch
+    print(render_task_list([result.task for result in results.values() if result.success and result.task]))
+    return 0
+
+
+def sync_mirror(args: argparse.Namespace) -> int:
+    from api.clickup_api import sync_task_mirror, get_clickup_team_id, ClickUpError
+    from api.task_mirror import get_task_mirror
+
+    mirror = get_task_mirror()
+    team_id = get_clickup_team_id()
+    if not mirror or not team_id:
+        print("Set CLICKUP_MIRROR_PATH and CLICKUP_TEAM_ID to sync the task mirror", file=sys.stderr)
+        return 1
+
+    try:
+        count = sync_task_mirror(mirror, team_id, full=args.full)
+    except ClickUpError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(f"Synced {count} updated tasks, {mirror.count()} tasks in {mirror.path}", file=sys.stderr)
+    return 0
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='clickup',
+        description='ClickUp helpers for the pull request workflows, all running in one process',
+    )
+    # Every subcommand takes the trace options, so they can come after the subcommand's own arguments
+    trace_options = argparse.ArgumentParser(add_help=False)
+    trace.add_arguments(trace_options)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_parse_ids = subparsers.add_parser(
+        "parse-ids", parents=[trace_options], help="Normalize task ids, links and branch names"
+    )
+    parser_parse_ids.add_argument("task_ids", nargs="+")
+    parser_parse_ids.set_defaults(handler=parse_ids)
+
+    parser_parse_comment = subparsers.add_parser(
+        "parse-comment", parents=[trace_options], help="List the task ids in a bot comment"
+    )
+    parser_parse_comment.add_argument("bot_comment", type=str)
+    parser_parse_comment.set_defaults(handler=parse_comment)
+
+    parser_update = subparsers.add_parser(
+        "update-status", parents=[trace_options], help="Update the status of tasks"
+    )
+    parser_update.add_argument("status", help="The status to update the task to")
+    parser_update.add_argument("task_ids", nargs="+", help="The task ids to update status for")
+    parser_update.set_defaults(handler=update_status)
+
+    parser_list = subparsers.add_parser(
+        "list-tasks", parents=[trace_options], help="Render tasks as a markdown list"
+    )
+    parser_list.add_argument("task_ids", nargs="+", help="The task ids to generate links for")
+    parser_list.set_defaults(handler=list_tasks)
+
+    parser_link = subparsers.add_parser(
+        "link-and-update", parents=[trace_options],
+        help="Parse the task ids of a PR, update their status and render them as a markdown list"
+    )
+    parser_link.add_argument("status", help="The status to update the tasks to")
+    parser_link.add_argument("--branch", type=str, help="Head branch of the PR, CU-<task-id>_... links a task")
+    parser_link.add_argument("--comment", type=str, help="PR comment, '/link <task> <task>' links tasks")
+    parser_link.set_defaults(handler=link_and_update)
+
+    parser_sync = subparsers.add_parser(
+        "sync-mirror", parents=[trace_options],
+        help="Bring the local task mirror at CLICKUP_MIRROR_PATH up to date with the team's tasks"
+    )
+    parser_sync.add_argument("--full", action="store_true", help="Sync every task instead of only the updated ones")
+    parser_sync.set_defaults(handler=sync_mirror)
+
+    for subparser in [parser_update, parser_list, parser_link]:
+        subparser.add_argument(
+            "-c", "--concurrency", type=int,
+            help="Maximum number of ClickUp requests sent at the same time"
+        )
+
+    args = parser.parse_args()
+    trace.configure(args)
+    return args
+
+
+def main() -> int:
+    args = get_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,47 +1,56 @@
 from __future__ import annotations
 
-import os
+import subprocess
 
+from common import trace
 
-def execute(command: str, read_result: bool, dry_run: bool, verbose: bool, shouldIgnoreError: bool = False) -> str | None:
-    if dry_run:
-        print(command, flush=True)
-        return None
 
+class CommandError(Exception):
+    command: str
+    returncode: int
+    output: str
+
+    def __init__(self, command: str, returncode: int, output: str = ""):
+        super().__init__(f"Error occurred ({returncode}): {command}" + (f"\n{output}" if output else ""))
+        self.command = command
+        self.returncode = returncode
+        self.output = output
+
+    def __reduce__(self):
+        # Lets the error cross from a worker process back to the caller
+        return type(self), (self.command, self.returncode, self.output)
+
+
+def run_command(command: list[str], cwd: str | None = None, verbose: bool = False,
+                error_type: type = CommandError, input: str | None = None) -> str:
     if verbose:
-        print(command, flush=True)
+        print(" ".join(command), flush=True)
 
-    proc = os.popen(command)
-    if read_result:
-        output = proc.read()
-        if verbose:
-            print(output, flush=True)
-        returncode = proc.close()
-        if returncode:
-            print("Error occurred: " + str(returncode))
-            if not shouldIgnoreError:
-              exit(1)
-        return output
+    with trace.span(" ".join(command[:2]), "subprocess", command=" ".join(command)) as details:
+        proc = subprocess.run(command, cwd=cwd, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              text=True)
+        details["returncode"] = proc.returncode
+    if proc.returncode != 0:
+        raise error_type(" ".join(command), proc.returncode, proc.stderr.strip())
+    return proc.stdout
 
 
 def get_current_highest_version_and_variant(verbose) -> (str, str):
-    _, variant_on_master, version_on_master = execute(
-        f'git log main --grep "build_" -n 1 | grep -oh "build_.*"',
-        read_result=True,
-        dry_run=False,
-        verbose=verbose
-    ).split("_")
-    # _, variant_on_beta, version_on_beta = execute(
-    #     f'git log release-beta --grep "build_" -n 1 | grep -oh "build_.*"',
-    #     read_result=True,
-    #     dry_run=False,
-    #     verbose=verbose
-    # ).split("_")
-    # higher_version = get_higher_version(version_on_master, version_on_beta)
-    # higher_variant = variant_on_master if higher_version == version_on_master else variant_on_beta
+    from common.git import GitError
+    from common.release_index import latest_releases
+    from common.shallow import ensure_release_history
+
+    ensure_release_history("main", 1, verbose=verbose)
+    releases_on_master = latest_releases("main", 1, verbose=verbose)
+    if not releases_on_master:
+        raise GitError("git log main --grep ^build_", 1, "No release commit found on main")
+    # releases_on_beta = latest_releases("release-beta", 1, verbose=verbose)
+    # higher_version = get_higher_version(releases_on_master[0].version, releases_on_beta[0].version)
+    # higher_variant = releases_on_master[0].variant if higher_version == releases_on_master[0].version \
+    #     else releases_on_beta[0].variant
     # return higher_version, higher_variant
 
-    return version_on_master, variant_on_master
+    return releases_on_master[0].version, releases_on_master[0].variant
 
 
 def get_higher_version(version1: str, version2: str) -> str:
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+from datetime import datetime
+from typing import Iterator
+
+from common import trace
+from common.common import CommandError, run_command
+
+RELEASE_SUBJECT_PATTERN = re.compile(r'^build_([^_\s]+)_(\S+)')
+LOG_FORMAT = "%H%x00%cI%x00%s"
+LOG_FIELDS = 3
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class GitError(CommandError):
+    pass
+
+
+class Commit:
+    hash: str
+    date: datetime
+    subject: str
+
+    def __init__(self, hash: str, date: datetime, subject: str):
+        self.hash = hash
+        self.date = date
+        self.subject = subject
+
+
+class ReleaseCommit(Commit):
+    variant: str
+    version: str
+
+    def __init__(self, hash: str, date: datetime, subject: str, variant: str, version: str):
+        super().__init__(hash, date, subject)
+        self.variant = variant
+        self.version = version
+
+
+def run_git(args: list[str], cwd: str | None = None, verbose: bool = False, input: str | None = None) -> str:
+    return run_command(["git"] + args, cwd=cwd, verbose=verbose, error_type=GitError, input=input)
+
+
+def resolve_commits(refs: list[str], cwd: str | None = None, verbose: bool = False) -> list[str]:
+    return run_git(["rev-parse"] + [f"{ref}^{{commit}}" for ref in refs], cwd=cwd, verbose=verbose).split()
+
+
+def parse_log_records(output: str) -> list[Commit]:
+    fields = output.split("\0")
+    if fields and fields[-1].strip() == "":
+        fields.pop()
+
+    commits = []
+    for i in range(0, len(fields) - LOG_FIELDS + 1, LOG_FIELDS):
+        hash, date, subject = fields[i:i + LOG_FIELDS]
+        commits.append(Commit(hash.strip(), datetime.fromisoformat(date), subject))
+    return commits
+
+
+def log(ref: str, grep: str | None = None, max_count: int | None = None, cwd: str | None = None,
+        verbose: bool = False) -> list[Commit]:
+    args = ["log", ref, f"--format={LOG_FORMAT}", "-z"]
+    if grep:
+        args.append(f"--grep={grep}")
+    if max_count is not None:
+        args.append(f"--max-count={max_count}")
+    return parse_log_records(run_git(args, cwd=cwd, verbose=verbose))
+
+
+def as_release_commit(commit: Commit) -> ReleaseCommit | None:
+    match = RELEASE_SUBJECT_PATTERN.match(commit.subject.strip())
+    if not match:
+        return None
+    return ReleaseCommit(commit.hash, commit.date, commit.subject, match.group(1), match.group(2))
+
+
+def iter_log_fields(args: list[str], fields: int, cwd: str | None = None, verbose: bool = False) -> Iterator[list[str]]:
+    # Reads NUL separated `git log -z` output chunk by chunk and yields one commit's fields at a time
+    command = ["git"] + args
+    if verbose:
+        print(" ".join(command), flush=True)
+
+    with trace.span(f"git {args[0]}", "subprocess", command=" ".join(command)) as details:
+        returncode, stderr = yield from _read_log_fields(command, fields, cwd)
+        details["returncode"] = returncode
+
+    if returncode != 0:
+        raise GitError(" ".join(command), returncode, stderr.strip())
+
+
+def _read_log_fields(command: list[str], fields: int, cwd: str | None) -> Iterator[list[str]]:
+    proc = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    pending = b""
+    record = []
+    try:
+        while True:
+            chunk = proc.stdout.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            parts = (pending + chunk).split(b"\0")
+            pending = parts.pop()
+            for part in parts:
+                record.append(part.decode("utf-8", errors="replace"))
+                if len(record) == fields:
+                    yield record
+                    record = []
+        if pending.strip():
+            record.append(pending.decode("utf-8", errors="replace"))
+        if len(record) == fields:
+            yield record
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode("utf-8", errors="replace")
+        proc.stderr.close()
+        returncode = proc.wait()
+    return returncode, stderr
+
+
+def iter_commit_messages(revision_range: str, cwd: str | None = None, verbose: bool = False,
+                         extra_args: list[str] | None = None) -> Iterator[(str, str, str)]:
+    # Yields (hash, author, full message) for every commit in the range, newest first
+    for hash, author, message in iter_log_fields(
+            ["log", revision_range, "--format=%H%x00%an%x00%B", "-z"] + (extra_args or []), 3, cwd=cwd,
+            verbose=verbose
+    ):
+        yield hash.strip(), author, message
+
+
+def get_commit_url_prefix(cwd: str | None = None) -> str:
+    # GitHub Actions already knows the repository, so only ask git when running elsewhere
+    # or about another repository than the one the workflow checked out
+    if cwd is None and os.environ.get("GITHUB_REPOSITORY"):
+        server = os.environ.get("GITHUB_SERVER_URL", "https://github.com")
+        return f"{server}/{os.environ['GITHUB_REPOSITORY']}/commit/"
+
+    try:
+        remote = run_git(["remote", "get-url", "origin"], cwd=cwd).strip()
+    except GitError:
+        return ""
+    match = re.match(r'^(?:git@|ssh://git@|https?://(?:[^@/]+@)?)([^:/]+)[:/](.+?)(?:\.git)?/?$', remote)
+    if not match:
+        return ""
+    return f"https://{match.group(1)}/{match.group(2)}/commit/"
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import json
+from typing import Callable
+
+from common.git import run_git, GitError
+
+# Drafts live in their own refs so that they never show up in branch history or tags
+DRAFT_REF_PREFIX = "refs/release-draft"
+DRAFT_FILE = "draft.json"
+DRAFT_VERSION = 1
+# Another merge may push its entries in between, in which case the update is applied again on top
+MAX_PUSH_ATTEMPTS = 5
+# What git fetch says when the draft ref doesn't exist on the remote yet
+MISSING_REF_MESSAGE = "couldn't find remote ref"
+
+
+class Draft:
+    branch: str
+    # Commits whose task references are already in the draft, so that reruns add nothing twice
+    commits: list[str]
+    # Task id to {"name", "url", "dev_messages": [{"message", "commit_hash", "url", "author"}]}, in merge order
+    tasks: dict[str, dict]
+
+    def __init__(self, branch: str, commits: list[str] | None = None, tasks: dict[str, dict] | None = None):
+        self.branch = branch
+        self.commits = commits or []
+        self.tasks = tasks or {}
+
+    @classmethod
+    def from_json(cls, branch: str, text: str) -> Draft:
+        data = json.loads(text)
+        if data.get("version") != DRAFT_VERSION:
+            raise ValueError(f"Unsupported release draft version {data.get('version')}")
+        return cls(branch, data["commits"], data["tasks"])
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"version": DRAFT_VERSION, "branch": self.branch, "commits": self.commits, "tasks": self.tasks},
+            indent=1
+        )
+
+    def add_task(self, task_id: str, name: str, url: str, dev_messages: list[dict]):
+        task = self.tasks.setdefault(task_id, {"name": name, "url": url, "dev_messages": []})
+        task["name"] = name
+        task["url"] = url
+        task["dev_messages"] += [message for message in dev_messages if message not in task["dev_messages"]]
+
+
+def draft_ref(branch: str) -> str:
+    return f"{DRAFT_REF_PREFIX}/{branch}"
+
+
+def release_ref(branch: str, version: str) -> str:
+    return f"{DRAFT_REF_PREFIX}/releases/{branch}/{version}"
+
+
+def read_draft(branch: str, cwd: str | None = None, verbose: bool = False,
+               ref: str | None = None) -> (Draft, str | None):
+    # Returns the draft on the remote together with the commit holding it, None when there is none yet
+    ref = ref or draft_ref(branch)
+    try:
+        run_git(["fetch", "--no-tags", "origin", f"+{ref}:{ref}"], cwd=cwd, verbose=verbose)
+    except GitError as error:
+        # Any other failure has to stop the caller, pushing an empty draft would replace the one on the remote
+        if MISSING_REF_MESSAGE not in error.output:
+            raise
+        return Draft(branch), None
+    commit = run_git(["rev-parse", ref], cwd=cwd, verbose=verbose).strip()
+    text = run_git(["cat-file", "blob", f"{commit}:{DRAFT_FILE}"], cwd=cwd, verbose=verbose)
+    return Draft.from_json(branch, text), commit
+
+
+def write_draft(draft: Draft, parent: str | None, message: str, cwd: str | None = None,
+                verbose: bool = False) -> str:
+    # Builds the commit with plumbing only, so neither the index nor the working tree is touched
+    blob = run_git(["hash-object", "-w", "--stdin"], cwd=cwd, verbose=verbose, input=draft.to_json()).strip()
+    tree = run_git(["mktree"], cwd=cwd, verbose=verbose, input=f"100644 blob {blob}\t{DRAFT_FILE}\n").strip()
+    parents = ["-p", parent] if parent else []
+    return run_git(["commit-tree", tree] + parents + ["-m", message], cwd=cwd, verbose=verbose).strip()
+
+
+def update_draft(branch: str, update: Callable[[Draft], bool], message: str,
+                 extra_refspecs: Callable[[str | None], list[str]] | None = None,
+                 cwd: str | None = None, verbose: bool = False) -> Draft:
+    # update() changes the draft in place and returns whether there is anything to push.
+    # extra_refspecs() gets the commit the update started from and may push more refs along with it.
+    ref = draft_ref(branch)
+    for attempt in range(1, MAX_PUSH_ATTEMPTS + 1):
+        draft, parent = read_draft(branch, cwd, verbose)
+        if not update(draft):
+            return draft
+
+        commit = write_draft(draft, parent, message, cwd, verbose)
+        refspecs = [f"{commit}:{ref}"] + (extra_refspecs(parent) if extra_refspecs else [])
+        try:
+            run_git(["push", "--atomic", "origin"] + refspecs, cwd=cwd, verbose=verbose)
+        except GitError:
+            if attempt == MAX_PUSH_ATTEMPTS:
+                raise
+            continue
+        run_git(["update-ref", ref, commit], cwd=cwd, verbose=verbose)
+        return draft
+
+
+def freeze_draft(branch: str, version: str, cwd: str | None = None, verbose: bool = False) -> Draft:
+    # Keeps the draft as it is under the release's own ref and starts the branch's draft over.
+    # Freezing the same version again returns what was frozen the first time.
+    frozen, commit = read_draft(branch, cwd, verbose, ref=release_ref(branch, version))
+    if commit:
+        return frozen
+
+    def reset(draft: Draft) -> bool:
+        frozen.commits, frozen.tasks = draft.commits, draft.tasks
+        if not draft.commits:
+            return False
+        draft.commits, draft.tasks = [], {}
+        return True
+
+    update_draft(
+        branch, reset, f"Freeze release draft for {version}",
+        lambda parent: [f"{parent}:{release_ref(branch, version)}"] if parent else [],
+        cwd, verbose
+    )
+    return frozen
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from common.git import run_git, log, as_release_commit, ReleaseCommit, GitError
+
+INDEX_VERSION = 1
+INDEX_FILE_NAME = "release-index.json"
+
+
+class RefReleases:
+    tip: str
+    # Digest of the shallow clone boundary the releases were read with, empty for a full clone. Every fresh
+    # shallow checkout has a new boundary, so the index only pays off in a clone that is kept between runs
+    boundary: str
+    # Oldest first, in history order
+    releases: list[ReleaseCommit]
+
+    def __init__(self, tip: str, releases: list[ReleaseCommit], boundary: str = ""):
+        self.tip = tip
+        self.boundary = boundary
+        self.releases = list(releases)
+
+    def latest(self, n: int) -> list[ReleaseCommit]:
+        return self.releases[-n:][::-1] if n > 0 else []
+
+
+class ReleaseIndex:
+    path: str
+    refs: dict[str, RefReleases]
+
+    def __init__(self, path: str, cwd: str | None = None, verbose: bool = False):
+        self.path = path
+        self.cwd = cwd
+        self.verbose = verbose
+        self.refs = {}
+        self._dirty = False
+        self._shallow_path = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+
+        for ref, entry in data["refs"].items():
+            self.refs[ref] = RefReleases(entry["tip"], [
+                ReleaseCommit(hash, datetime.fromisoformat(date), subject, variant, version)
+                for hash, date, subject, variant, version in entry["releases"]
+            ], entry.get("boundary", ""))
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "refs": {
+                ref: {
+                    "tip": entry.tip,
+                    "boundary": entry.boundary,
+                    "releases": [
+                        [release.hash, release.date.isoformat(), release.subject, release.variant, release.version]
+                        for release in entry.releases
+                    ]
+                }
+                for ref, entry in self.refs.items()
+            }
+        }
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(data, file)
+        os.replace(temporary_path, self.path)
+        self._dirty = False
+
+    def _resolve_tip(self, ref: str) -> str:
+        try:
+            return run_git(["rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"], cwd=self.cwd,
+                           verbose=self.verbose).strip()
+        except GitError:
+            return ""
+
+    def _shallow_boundary(self) -> str:
+        if self._shallow_path is None:
+            path = run_git(["rev-parse", "--git-path", "shallow"], cwd=self.cwd, verbose=self.verbose).strip()
+            self._shallow_path = os.path.join(self.cwd or os.getcwd(), path)
+        try:
+            with open(self._shallow_path, "rb") as file:
+                return hashlib.sha1(file.read()).hexdigest()
+        except OSError:
+            return ""
+
+    def _is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        try:
+            run_git(["merge-base", "--is-ancestor", ancestor, descendant], cwd=self.cwd, verbose=self.verbose)
+            return True
+        except GitError:
+            return False
+
+    def _walk_releases(self, revision_range: str) -> list[ReleaseCommit]:
+        commits = log(revision_range, grep="^build_", cwd=self.cwd, verbose=self.verbose)
+        # git log lists the newest commit first
+        return [release for commit in reversed(commits) if (release := as_release_commit(commit)) is not None]
+
+    def update(self, ref: str) -> RefReleases:
+        tip = self._resolve_tip(ref)
+        boundary = self._shallow_boundary()
+        entry = self.refs.get(ref)
+        if entry is not None and entry.tip == tip and entry.boundary == boundary:
+            return entry
+
+        # Deepening a shallow clone reveals older releases without moving the tip, so only
+        # history read with the same boundary can be extended
+        if not tip:
+            entry = RefReleases("", [], boundary)
+        elif entry is not None and entry.tip and entry.boundary == boundary and self._is_ancestor(entry.tip, tip):
+            entry.releases += self._walk_releases(f"{entry.tip}..{tip}")
+            entry.tip = tip
+        else:
+            entry = RefReleases(tip, self._walk_releases(tip), boundary)
+
+        self.refs[ref] = entry
+        self._dirty = True
+        return entry
+
+    def latest_releases(self, ref: str, n: int) -> list[ReleaseCommit]:
+        return self.update(ref).latest(n)
+
+
+def get_index_path(cwd: str | None = None) -> str:
+    # RELEASE_INDEX_PATH is the index of the repository in the working directory only
+    path = os.environ.get("RELEASE_INDEX_PATH") if cwd is None else None
+    if path:
+        return path
+    git_dir = run_git(["rev-parse", "--absolute-git-dir"], cwd=cwd).strip()
+    return os.path.join(git_dir, INDEX_FILE_NAME)
+
+
+_indexes: dict[str | None, ReleaseIndex] = {}
+
+
+def get_release_index(cwd: str | None = None, verbose: bool = False) -> ReleaseIndex:
+    index = _indexes.get(cwd)
+    if index is None:
+        index = ReleaseIndex(get_index_path(cwd), cwd=cwd, verbose=verbose)
+        _indexes[cwd] = index
+    return index
+
+
+def latest_releases(ref: str, n: int, cwd: str | None = None, verbose: bool = False) -> list[ReleaseCommit]:
+    index = get_release_index(cwd, verbose)
+    releases = index.latest_releases(ref, n)
+    index.save()
+    return releases
+
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+def make_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, task_ids TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    # Returns the payload stored under key, unless one of the tasks it was rendered from has changed since
+    def get(self, key: str, current_fingerprint) -> str | None:
+        row = self._connection.execute(
+            "SELECT payload, task_ids, fingerprint FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        payload, task_ids, fingerprint = row
+        if current_fingerprint(json.loads(task_ids)) != fingerprint:
+            self._connection.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._connection.commit()
+            return None
+        return payload
+
+    def put(self, key: str, payload: str, task_ids: list[str], fingerprint: str):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO results (key, payload, task_ids, fingerprint, created_at) VALUES (?, ?, ?, ?, ?)",
+            (key, payload, json.dumps(task_ids), fingerprint, time.time())
+        )
+        self._connection.commit()
+
+
+# The cache configured through RELEASE_NOTES_CACHE_PATH, or None when result caching is disabled
+def get_result_cache() -> ResultCache | None:
+    path = os.environ.get("RELEASE_NOTES_CACHE_PATH")
+    return ResultCache(path) if path else None
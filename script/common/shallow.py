@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from common import trace
+from common.git import run_git, resolve_commits, GitError
+from common.release_index import get_release_index
+
+REMOTE = "origin"
+# Commits fetched by the first deepening step, every further step doubles it
+DEEPEN_STEP = 100
+MAX_DEEPEN_STEPS = 8
+
+
+def is_shallow_repository(cwd: str | None = None, verbose: bool = False) -> bool:
+    return run_git(["rev-parse", "--is-shallow-repository"], cwd=cwd, verbose=verbose).strip() == "true"
+
+
+def fetch_depth_args(cwd: str | None = None, verbose: bool = False) -> list[str]:
+    # Fetching a new branch into a shallow clone without a depth downloads its whole history
+    return ["--depth=1"] if is_shallow_repository(cwd, verbose) else []
+
+
+def fetch_commands(refspecs: list[str], cwd: str | None = None, verbose: bool = False) -> list[list[str]]:
+    # A depth on a ref that is already here would cut off the history deepened for it before, so only the
+    # refs new to a shallow clone are fetched with one, in a fetch of their own
+    if not is_shallow_repository(cwd, verbose):
+        return [["git", "fetch", REMOTE] + refspecs]
+    present = [spec for spec in refspecs if exist_locally([spec.lstrip("+").split(":")[-1]], cwd, verbose)]
+    new = [spec for spec in refspecs if spec not in present]
+    return ([["git", "fetch", REMOTE] + present] if present else []) + \
+        ([["git", "fetch", "--depth=1", REMOTE] + new] if new else [])
+
+
+def remote_branches(refs: list[str]) -> list[str]:
+    return [ref.removeprefix(f"{REMOTE}/") for ref in refs]
+
+
+def deepen(refs: list[str], depth: int, cwd: str | None = None, verbose: bool = False):
+    with trace.span("git deepen", "phase", depth=depth, refs=" ".join(refs)):
+        run_git(["fetch", f"--deepen={depth}", REMOTE] + remote_branches(refs), cwd=cwd, verbose=verbose)
+
+
+def unshallow(refs: list[str], cwd: str | None = None, verbose: bool = False):
+    with trace.span("git unshallow", "phase", refs=" ".join(refs)):
+        run_git(["fetch", "--unshallow", REMOTE] + remote_branches(refs), cwd=cwd, verbose=verbose)
+
+
+def exist_locally(refs: list[str], cwd: str | None = None, verbose: bool = False) -> bool:
+    try:
+        resolve_commits(refs, cwd=cwd, verbose=verbose)
+        return True
+    except GitError:
+        return False
+
+
+def deepen_until(found: Callable[[], bool], refs: list[str], cwd: str | None = None, verbose: bool = False) -> bool:
+    # Fetches older history of refs in doubling steps until found() holds or there is nothing left to fetch,
+    # so the cost grows with the history that is needed rather than with the age of the repository
+    if found():
+        return True
+    # Deepening cannot bring in a ref that was never fetched
+    if not exist_locally(refs, cwd, verbose):
+        return False
+
+    depth = DEEPEN_STEP
+    for _ in range(MAX_DEEPEN_STEPS):
+        if found():
+            return True
+        if not is_shallow_repository(cwd, verbose):
+            return False
+        deepen(refs, depth, cwd, verbose)
+        depth *= 2
+
+    if found():
+        return True
+    if is_shallow_repository(cwd, verbose):
+        unshallow(refs, cwd, verbose)
+    return found()
+
+
+def ensure_release_history(ref: str, count: int, cwd: str | None = None, verbose: bool = False) -> bool:
+    # Makes sure the newest count release commits of ref are in the local history
+    index = get_release_index(cwd, verbose)
+    found = deepen_until(lambda: len(index.latest_releases(ref, count)) >= count, [ref], cwd, verbose)
+    index.save()
+    return found
+
+
+def has_merge_base(first: str, second: str, cwd: str | None = None, verbose: bool = False) -> bool:
+    try:
+        run_git(["merge-base", first, second], cwd=cwd, verbose=verbose)
+        return True
+    except GitError:
+        return False
+
+
+def ensure_merge_base(first: str, second: str, cwd: str | None = None, verbose: bool = False,
+                      refs: list[str] | None = None) -> bool:
+    # refs are what gets deepened when first and second are not names the remote knows, like hash^1
+    return deepen_until(lambda: has_merge_base(first, second, cwd, verbose), refs or [first, second], cwd, verbose)
+
+
+def ensure_full_history(ref: str, cwd: str | None = None, verbose: bool = False):
+    if is_shallow_repository(cwd, verbose):
+        unshallow([ref], cwd, verbose)
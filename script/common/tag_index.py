@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import bisect
+import re
+
+from common.git import run_git
+
+VERSION_PATTERN = re.compile(r'(?<!\d)(\d+)\.(\d+)\.(\d+)(?!\d)')
+
+
+class TagIndex:
+    # (major, minor, patch) of every tag that carries a version, sorted numerically
+    versions: list[tuple]
+
+    def __init__(self, tags: list[str]):
+        versions = set()
+        for tag in tags:
+            match = VERSION_PATTERN.search(tag)
+            if match:
+                versions.add(tuple(int(number) for number in match.groups()))
+        self.versions = sorted(versions)
+
+    @classmethod
+    def from_repo(cls, cwd: str | None = None, verbose: bool = False) -> TagIndex:
+        output = run_git(["for-each-ref", "--format=%(refname:short)", "refs/tags"], cwd=cwd, verbose=verbose)
+        return cls(output.splitlines())
+
+    @classmethod
+    def from_remote(cls, remote: str = "origin", cwd: str | None = None, verbose: bool = False) -> TagIndex:
+        # A shallow clone has few or no tags locally, but the tag names alone are enough
+        output = run_git(["ls-remote", "--tags", "--refs", remote], cwd=cwd, verbose=verbose)
+        return cls([line.split("\t", 1)[1].removeprefix("refs/tags/") for line in output.splitlines() if "\t" in line])
+
+    def highest_patch(self, major: int, minor: int, minimum_patch: int = 0) -> int | None:
+        # Everything sorting before (major, minor + 1) with the same major.minor is a candidate
+        position = bisect.bisect_left(self.versions, (major, minor + 1))
+        if position == 0:
+            return None
+        highest = self.versions[position - 1]
+        if highest[:2] != (major, minor) or highest[2] < minimum_patch:
+            return None
+        return highest[2]
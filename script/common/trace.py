@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import argparse
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_enabled = False
+_trace_path: str | None = None
+_print_summary = False
+_events: list[dict] = []
+_events_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Print a summary of the time spent in subprocesses, HTTP requests and rendering to stderr"
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE", type=str,
+        help="Write every recorded span to FILE in Chrome trace-event format"
+    )
+
+
+def configure(args: argparse.Namespace):
+    enable(trace_path=args.trace, print_summary=args.profile)
+
+
+def enable(trace_path: str | None = None, print_summary: bool = False):
+    global _enabled, _trace_path, _print_summary
+    if not trace_path and not print_summary:
+        return
+    if not _enabled:
+        atexit.register(finish)
+    _enabled = True
+    _trace_path = trace_path
+    _print_summary = print_summary
+
+
+@contextmanager
+def span(name: str, category: str, **args):
+    # The yielded dict can be filled with details that are only known once the work is done
+    if not _enabled:
+        yield args
+        return
+
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - _origin) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with _events_lock:
+            _events.append(event)
+
+
+def _run_in_worker(enabled: bool, function, *args):
+    global _enabled
+    # A spawned worker starts with tracing off, a forked one with a copy of the spans recorded so far
+    _enabled = enabled
+    with _events_lock:
+        start = len(_events)
+    result = function(*args)
+    with _events_lock:
+        return result, _events[start:]
+
+
+# Wraps function for a worker process so that it also returns the spans it recorded; merge() adds them to
+# this process's spans and gives back the results
+def worker(function):
+    return functools.partial(_run_in_worker, _enabled, function)
+
+
+def merge(results) -> list:
+    merged = []
+    for result, recorded in results:
+        with _events_lock:
+            _events.extend(recorded)
+        merged.append(result)
+    return merged
+
+
+def events() -> list[dict]:
+    with _events_lock:
+        return list(_events)
+
+
+def summary_rows() -> list[(str, str, int, float, float)]:
+    totals = {}
+    for event in events():
+        key = (event["cat"], event["name"])
+        count, total, longest = totals.get(key, (0, 0.0, 0.0))
+        duration = event["dur"] / 1e6
+        totals[key] = (count + 1, total + duration, max(longest, duration))
+    rows = [(category, name, count, total, longest) for (category, name), (count, total, longest) in totals.items()]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def summary_table() -> str:
+    rows = summary_rows()
+    name_width = max([len(name) for _, name, _, _, _ in rows] + [4])
+    lines = [f"{'category':<10} {'name':<{name_width}} {'count':>6} {'total(s)':>9} {'max(s)':>8}"]
+    for category, name, count, total, longest in rows:
+        lines.append(f"{category:<10} {name:<{name_width}} {count:>6} {total:>9.3f} {longest:>8.3f}")
+    lines.append(f"wall time: {time.perf_counter() - _origin:.3f}s")
+    return "\n".join(lines)
+
+
+def write_trace(path: str):
+    import json
+
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events(), "displayTimeUnit": "ms"}, file)
+
+
+def finish():
+    if _trace_path:
+        write_trace(_trace_path)
+    if _print_summary:
+        print(summary_table(), file=sys.stderr)
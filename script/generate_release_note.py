@@ -3,12 +3,28 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import re
-from datetime import datetime
-
-from common.common import execute, get_current_highest_version_and_variant
-from build_release_notes import build_slack_message, Release, Task, DevMessage
-from api.clickup_api import get_clickup_task
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from common import trace
+from common.common import get_current_highest_version_and_variant, CommandError
+from common.git import iter_commit_messages, get_commit_url_prefix, resolve_commits, GitError, \
+    RELEASE_SUBJECT_PATTERN
+from common.release_draft import freeze_draft
+from common.release_index import latest_releases
+from common.result_cache import get_result_cache, make_key
+from common.shallow import ensure_release_history, ensure_merge_base, ensure_full_history
+from build_release_notes import build_slack_message, build_combined_slack_message, Release, Task, DevMessage, \
+    RENDERER_VERSION
+from api.clickup_api import bulk_get_clickup_tasks, DEFAULT_CONCURRENCY
+from api.github_api import iter_merged_pull_requests
+from api.task_cache import get_task_cache
+from api.task_filter import filter_task_candidates
+
+TASK_REFERENCE_PATTERN = re.compile(r'#(\w+)(?:\s*\{\s*([^}]*)\s*})?')
 
 
 def parse_clickup_task_id_from_branch_name(branch_name: str) -> str | None:
@@ -19,57 +35,186 @@ def parse_clickup_task_id_from_branch_name(branch_name: str) -> str | None:
         return None
 
 
-def get_logs(branch: str, target_branch: str) -> str:
-    return execute(
-        f'git log {target_branch}..{branch}',
-        read_result=True,
-        dry_run=False,
-        verbose=False
-    )
+def iter_message_task_references(commit_hash: str, author: str,
+                                 message: str) -> Iterator[(str, str | None, str, str)]:
+    for match in TASK_REFERENCE_PATTERN.finditer(message):
+        dev_message = match.group(2).strip() if match.group(2) else None
+        yield match.group(1), dev_message, commit_hash, author
+
 
+def iter_task_references(branch: str, target_branch: str,
+                         cwd: str | None = None) -> Iterator[(str, str | None, str, str)]:
+    # Yields (task id, dev message, commit hash, author) while git log is still streaming
+    for commit_hash, author, message in iter_commit_messages(f"{target_branch}..{branch}", cwd=cwd):
+        yield from iter_message_task_references(commit_hash, author, message)
 
-def parse_task_id_and_dev_message(logs: str) -> dict[str, list[str]]:
+
+def collect_task_dev_messages(references: Iterator[(str, str | None, str, str)],
+                              commit_url_prefix: str) -> dict[str, list[DevMessage]]:
     results = {}
-    pattern = re.compile(r'#(\w+)(?:\s*\{\s*([^}]*)\s*})?')
-
-    matches = pattern.findall(logs)
-    for match in matches:
-        task = match[0]
-        dev_message = match[1].strip() if match[1] else None
-        if task not in results:
-            results[task] = []
+    for task_id, dev_message, commit_hash, author in references:
+        if task_id not in results:
+            results[task_id] = []
         if dev_message:
-            results[task].append(dev_message)
-
+            # Without a known remote there is nothing to link to, a bare hash is no url Slack accepts
+            url = commit_url_prefix + commit_hash if commit_url_prefix else ""
+            results[task_id].append(DevMessage(dev_message, commit_hash, url, author))
     return results
 
 
-def get_latest_2_release_commit_hashes(branch):
-    command = f'git log {branch} --grep "build_" -n 2 | grep -oh "commit .*" | cut -d " " -f 2'
-    commits = execute(
-        command,
-        read_result=True,
-        dry_run=False,
-        verbose=False
-    ).splitlines()
-
-    return commits[0], commits[1]
-
-
-def get_nth_release_date_for_branch(branch, n, verbose):
-    date_string = execute(
-        f'git log {branch} --grep "build_" -n {n} --date=iso-strict | grep -oh "Date: .*"',
-        read_result=True,
-        dry_run=False,
-        verbose=verbose
-    ).splitlines()[n - 1]
-    return datetime.fromisoformat(date_string.removeprefix("Date:").strip()).isoformat(sep="T", timespec="auto")
+def split_history_at_releases(branch: str,
+                              limit: int | None = None) -> list[(str, str, dict[str, list[DevMessage]])]:
+    # Walks the history of branch once, newest first. The commits after a release commit, up to the next
+    # release commit, make up that release's range. Commits older than the oldest release belong to no range.
+    # Returns (version, release commit, task dev messages) for every range
+    commit_url_prefix = get_commit_url_prefix()
+    ranges = []
+    current_version = None
+    current_commit = None
+    references = []
+    for commit_hash, author, message in iter_commit_messages(branch, extra_args=["--topo-order"]):
+        match = RELEASE_SUBJECT_PATTERN.match(message.strip())
+        if match:
+            if current_version is not None:
+                ranges.append((current_version, current_commit,
+                               collect_task_dev_messages(iter(references), commit_url_prefix)))
+                if limit and len(ranges) >= limit:
+                    return ranges
+            current_version = match.group(2)
+            current_commit = commit_hash
+            references = []
+        elif current_version is not None:
+            references += iter_message_task_references(commit_hash, author, message)
+    return ranges
+
+
+def write_release_notes(directory: str, name: str, payload: str) -> str:
+    path = os.path.join(directory, f"{name}.jsonl")
+    with open(path, "w") as file:
+        file.write(payload + "\n")
+    return path
+
+
+def backfill_release_notes(branch: str, concurrency: int, limit: int | None, output_dir: str | None) -> str:
+    with trace.span("fetch history", "phase"):
+        # The oldest range ends at the release before it
+        if limit:
+            ensure_release_history(branch, limit + 1)
+        else:
+            ensure_full_history(branch)
+    with trace.span("split history", "phase"):
+        ranges = split_history_at_releases(branch, limit)
+
+    task_ids = list(dict.fromkeys(task_id for _, _, task_message_dict in ranges for task_id in task_message_dict))
+    with trace.span("filter task ids", "phase", count=len(task_ids)) as details:
+        task_ids, details["skipped"] = filter_task_candidates(task_ids)
+    with trace.span("fetch tasks", "phase", count=len(task_ids)):
+        clickup_tasks = bulk_get_clickup_tasks(task_ids, concurrency)
+
+    releases = [
+        Release(version, [
+            Task(task_id, task["name"], task["url"], dev_messages)
+            for task_id, dev_messages in task_message_dict.items()
+            if (task := clickup_tasks.get(task_id))
+        ])
+        for version, _, task_message_dict in ranges
+    ]
+    with trace.span("build slack messages", "render", releases=len(releases)):
+        payloads = [build_slack_message(release) for release in releases]
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        # The same version can be released more than once, so the release commit tells the files apart
+        return "\n".join(
+            write_release_notes(output_dir, f"{version}-{commit[:12]}", payload)
+            for (version, commit, _), payload in zip(ranges, payloads)
+        )
+    return "\n".join(payloads)
+
+
+class Repository:
+    name: str
+    path: str
+    release_branch: str
+
+    def __init__(self, name: str, path: str, release_branch: str = "main"):
+        self.name = name
+        self.path = path
+        self.release_branch = release_branch
+
+
+def load_repositories(config_path: str) -> list[Repository]:
+    # A JSON list of {"path", "name", "release_branch"}, with paths relative to the file
+    with open(config_path) as file:
+        entries = json.load(file)
+    base = os.path.dirname(os.path.abspath(config_path))
+    repositories = []
+    for entry in entries:
+        if not isinstance(entry, dict) or "path" not in entry:
+            raise ValueError(f"Every repository listed in {config_path} needs a \"path\"")
+        path = os.path.join(base, entry["path"])
+        if not os.path.isdir(path):
+            raise ValueError(f"Repository {path} listed in {config_path} does not exist")
+        name = entry.get("name") or os.path.basename(os.path.normpath(path))
+        # The name labels the notes and names their file under --output-dir, so it has to be unique
+        if any(repository.name == name for repository in repositories):
+            raise ValueError(f"More than one repository in {config_path} is named {name}, "
+                             f"give them distinct \"name\" entries")
+        repositories.append(Repository(name, path, entry.get("release_branch", "main")))
+    return repositories
+
+
+def collect_repository_release(repository: Repository) -> (str, dict[str, list[DevMessage]]):
+    # Runs in a worker process per repository and only talks to git
+    branch = repository.release_branch
+    ensure_release_history(branch, 2, cwd=repository.path)
+    releases = latest_releases(branch, 2, cwd=repository.path)
+    if len(releases) < 2:
+        raise GitError(f"git log {branch} --grep ^build_", 1,
+                       f"Less than 2 release commits found on {branch} in {repository.path}")
+    references = iter_task_references(releases[0].hash, releases[1].hash, cwd=repository.path)
+    return releases[0].version, collect_task_dev_messages(references, get_commit_url_prefix(repository.path))
+
+
+def fan_out_release_notes(repositories: list[Repository], concurrency: int, output_dir: str | None) -> str:
+    if not repositories:
+        return ""
+    with trace.span("collect repositories", "phase", repositories=len(repositories)):
+        with ProcessPoolExecutor(max_workers=len(repositories)) as executor:
+            collected = trace.merge(executor.map(trace.worker(collect_repository_release), repositories))
+
+    # A task shipped by several apps is only fetched once
+    task_ids = list(dict.fromkeys(task_id for _, task_message_dict in collected for task_id in task_message_dict))
+    with trace.span("filter task ids", "phase", count=len(task_ids)) as details:
+        task_ids, details["skipped"] = filter_task_candidates(task_ids)
+    with trace.span("fetch tasks", "phase", count=len(task_ids)):
+        clickup_tasks = bulk_get_clickup_tasks(task_ids, concurrency)
+
+    releases = [
+        Release(version, [
+            Task(task_id, task["name"], task["url"], dev_messages)
+            for task_id, dev_messages in task_message_dict.items()
+            if (task := clickup_tasks.get(task_id))
+        ], repository.name)
+        for repository, (version, task_message_dict) in zip(repositories, collected)
+    ]
+    with trace.span("build slack message", "render", releases=len(releases)):
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            return "\n".join(
+                write_release_notes(output_dir, repository.name, build_slack_message(release))
+                for repository, release in zip(repositories, releases)
+            )
+        return build_combined_slack_message(releases)
 
 
 def get_latest_release_dates(verbose):
-    releases_on_beta = [get_nth_release_date_for_branch("release-beta", it, verbose) for it in [1, 2]]
-    releases_on_master = [get_nth_release_date_for_branch("main", it, verbose) for it in [1, 2]]
-    release_dates = releases_on_master + releases_on_beta
+    release_dates = []
+    for branch in ["main", "release-beta"]:
+        release_dates += [
+            commit.date.isoformat(sep="T", timespec="auto")
+            for commit in latest_releases(branch, 2, verbose=verbose)
+        ]
     release_dates.sort(reverse=True)
     return release_dates
 
@@ -82,14 +227,31 @@ def get_clickup_link_based_on_branch(branch_name: str) -> str | None:
         return None
 
 
+def resolve_root_branch(branch: str, merge_dict: dict[str, str], roots: dict[str, str | None],
+                        root_branch: str = 'dev') -> str | None:
+    # Follows head -> base links until root_branch or a branch no PR was merged from.
+    # Every branch on the walked path remembers the result, so each link is only followed once
+    # across all PRs. A chain that loops back on itself resolves to None.
+    path = []
+    on_path = set()
+    current = branch
+    while current != root_branch and current in merge_dict and current not in roots:
+        if current in on_path:
+            root = None
+            break
+        path.append(current)
+        on_path.add(current)
+        current = merge_dict[current]
+    else:
+        root = roots[current] if current in roots else current
+
+    for walked_branch in path:
+        roots[walked_branch] = root
+    return root
+
+
 def get_pr_descriptions_between_dates_from_dev(start, end, verbose=True):
-    gh_cli_result = execute(
-        f'gh pr list --search "is:closed merged:{start}..{end}" --json "body,number,baseRefName,headRefName"',
-        read_result=True,
-        dry_run=False,
-        verbose=verbose
-    )
-    all_prs = json.loads(gh_cli_result)
+    all_prs = list(iter_merged_pull_requests(start, end, verbose=verbose))
 
     # headRefName to baseRefName
     # This is for figuring out if the root branch is dev. For example: B->A->dev
@@ -98,16 +260,8 @@ def get_pr_descriptions_between_dates_from_dev(start, end, verbose=True):
     for pr in all_prs:
         merge_dict[pr['headRefName']] = pr['baseRefName']
 
-    prs = []
-    for pr in all_prs:
-        current_branch = pr['baseRefName']
-        while current_branch != 'dev':
-            try:
-                current_branch = merge_dict[current_branch]
-            except KeyError:
-                break
-        if current_branch == 'dev':
-            prs.append(pr)
+    roots = {}
+    prs = [pr for pr in all_prs if resolve_root_branch(pr['baseRefName'], merge_dict, roots) == 'dev']
 
     if verbose:
         [print(pr["number"]) for pr in prs]
@@ -145,13 +299,50 @@ def get_args():
         description='Generate release notes from PR release note entries that are between the two most recent releases',
     )
     parser.add_argument(
-        "branch", type=str, help="The branch to generate release notes for"
+        "branch", type=str, nargs="?", help="The branch to generate release notes for"
+    )
+    parser.add_argument(
+        "target_branch", type=str, nargs="?", help="The target branch to compare against"
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help="Maximum number of ClickUp tasks fetched at the same time"
     )
     parser.add_argument(
-        "target_branch", type=str, help="The target branch to compare against"
+        "--refresh", action="store_true",
+        help="Rebuild the release notes even if a cached result exists for the same release range"
     )
+    parser.add_argument(
+        "--backfill", action="store_true",
+        help="Generate release notes for every release on the branch (main unless given) in one history walk"
+    )
+    parser.add_argument(
+        "--from-draft", action="store_true",
+        help="Render the draft kept up to date on every merge into the branch (dev unless given) and freeze it"
+    )
+    parser.add_argument(
+        "--limit", type=int, help="With --backfill, only generate the most recent LIMIT releases"
+    )
+    parser.add_argument(
+        "--repos", type=str, metavar="FILE",
+        help="Generate the notes of the latest release of every repository in the JSON list FILE, "
+             "each entry being {\"path\": ..., \"name\": ..., \"release_branch\": \"main\"}"
+    )
+    parser.add_argument(
+        "--output-dir", type=str,
+        help="With --backfill, write one <version>-<release commit>.jsonl file per release instead of printing "
+             "all of them. With --repos, write one <name>.jsonl file per repository instead of one combined message"
+    )
+    trace.add_arguments(parser)
     args = parser.parse_args()
-    return args.branch, args.target_branch
+    args.repositories = None
+    if args.repos:
+        try:
+            args.repositories = load_repositories(args.repos)
+        except (OSError, ValueError) as error:
+            parser.error(f"--repos: {error}")
+    trace.configure(args)
+    return args
 
 
 # def main():
@@ -168,31 +359,101 @@ def get_args():
 #         for entry in release_note_entries:
 #             print(entry)
 
-def main():
-    latest_release_commit_hash, previous_release_commit_hash = get_latest_2_release_commit_hashes("main")
-    logs = get_logs(latest_release_commit_hash, previous_release_commit_hash)
+def main() -> int:
+    args = get_args()
+    try:
+        if args.repos:
+            print(fan_out_release_notes(args.repositories, args.concurrency, args.output_dir))
+        elif args.from_draft:
+            print(generate_release_note_from_draft(args.branch or "dev"))
+        elif args.backfill:
+            print(backfill_release_notes(args.branch or "main", args.concurrency, args.limit, args.output_dir))
+        else:
+            print(generate_release_note(args.branch, args.target_branch, args.concurrency, args.refresh))
+    except CommandError as error:
+        print(error, file=sys.stderr)
+        return error.returncode
+    return 0
+
+
+def generate_release_note(branch: str | None, target_branch: str | None, concurrency: int,
+                          refresh: bool = False) -> str:
+    if branch and target_branch:
+        with trace.span("fetch history", "phase"):
+            ensure_merge_base(branch, target_branch)
+        branch, target_branch = resolve_commits([branch, target_branch])
+        version = get_current_highest_version_and_variant(False)[0]
+        updated_since = None
+    else:
+        with trace.span("fetch history", "phase"):
+            ensure_release_history("main", 2)
+        latest_releases_on_main = latest_releases("main", 2)
+        if len(latest_releases_on_main) < 2:
+            raise GitError("git log main --grep ^build_", 1, "Less than 2 release commits found on main")
+        branch, target_branch = latest_releases_on_main[0].hash, latest_releases_on_main[1].hash
+        # The latest release on main is what get_current_highest_version_and_variant reports
+        version = latest_releases_on_main[0].version
+        # Tasks worked on during this release have most likely been touched since the previous one
+        updated_since = latest_releases_on_main[1].date
     # task_id_from_branch_name = parse_clickup_task_id_from_branch_name(branch)
     # if task_id_from_branch_name:
     #     task_ids.add(task_id_from_branch_name)
 
+    # Cached results can only be checked against task changes when the task cache is enabled
+    task_cache = get_task_cache()
+    result_cache = get_result_cache() if task_cache else None
+    result_key = None
+    if result_cache:
+        # The fingerprint of the tasks a result was rendered from decides whether it is still current
+        result_key = make_key(target_branch, branch, version, RENDERER_VERSION)
+        if not refresh:
+            with trace.span("result cache lookup", "phase"):
+                cached = result_cache.get(result_key, task_cache.fingerprint)
+            if cached is not None:
+                return cached
+
     tasks = []
-    task_message_dict = parse_task_id_and_dev_message(logs)
-    for task_id in task_message_dict.keys():
-        task = get_clickup_task(task_id)
+    with trace.span("collect task references", "phase"):
+        task_message_dict = collect_task_dev_messages(
+            iter_task_references(branch, target_branch), get_commit_url_prefix()
+        )
+    with trace.span("filter task ids", "phase", count=len(task_message_dict)) as details:
+        task_ids, details["skipped"] = filter_task_candidates(list(task_message_dict.keys()))
+    with trace.span("fetch tasks", "phase", count=len(task_ids)):
+        clickup_tasks = bulk_get_clickup_tasks(task_ids, concurrency, updated_since)
+    for task_id, task in clickup_tasks.items():
         if task:
             tasks.append(Task(
                 task_id,
                 task["name"],
                 task["url"],
-                [DevMessage(message) for message in task_message_dict[task_id]]
+                task_message_dict[task_id]
             ))
 
-    release = Release(
-        get_current_highest_version_and_variant(False)[0],
-        tasks
-    )
-    print(build_slack_message(release))
+    release = Release(version, tasks)
+    with trace.span("build slack message", "render", tasks=len(tasks)):
+        payload = build_slack_message(release)
+
+    if result_cache:
+        fingerprint = task_cache.fingerprint(task_ids)
+        if fingerprint is not None:
+            result_cache.put(result_key, payload, task_ids, fingerprint)
+    return payload
+
+
+def generate_release_note_from_draft(branch: str) -> str:
+    # Every merge already added its tasks, so nothing here depends on the size of the release
+    version = get_current_highest_version_and_variant(False)[0]
+    with trace.span("freeze draft", "phase"):
+        draft = freeze_draft(branch, version)
+
+    release = Release(version, [
+        Task(task_id, task["name"], task["url"], [DevMessage(**message) for message in task["dev_messages"]])
+        for task_id, task in draft.tasks.items()
+    ])
+    with trace.span("build slack message", "render", tasks=len(release.tasks)):
+        return build_slack_message(release)
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
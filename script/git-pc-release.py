@@ -2,33 +2,21 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import shlex
+import sys
+import time
+from typing import Callable
 
-from common.common import execute, get_current_highest_version_and_variant
+from common import trace
+from common.common import run_command, get_current_highest_version_and_variant, CommandError
+from common.shallow import fetch_commands, ensure_merge_base, is_shallow_repository
+from common.tag_index import TagIndex
 
 VALID_BUILD_TYPES = ["all", "google", "beta", "alpha"]
-
-
-def commit_and_push(dry_run: bool, final_version: str, message: str, push: bool, variant: str, verbose: bool):
-    execute(
-        f'git commit --allow-empty -m "build_{variant}_{final_version}\n{message}"',
-        read_result=True,
-        dry_run=dry_run,
-        verbose=verbose
-    )
-    if push:
-        execute(f'git push', read_result=True, dry_run=dry_run, verbose=verbose)
-
-
-def merge_dev(dry_run: bool, verbose: bool):
-    execute('git pull origin dev --no-rebase --no-edit', read_result=True, dry_run=dry_run, verbose=verbose)
-
-
-def checkout_variant_branch(dry_run: bool, variant: str, verbose: bool):
-    execute("git stash", read_result=True, dry_run=dry_run, verbose=verbose)
-    if variant == 'all' or variant == 'google':
-        execute("git checkout main", read_result=True, dry_run=dry_run, verbose=verbose)
-    elif variant == 'beta':
-        execute("git checkout release-beta", read_result=True, dry_run=dry_run, verbose=verbose)
+# Alpha releases use patch numbers from 50 up so they never collide with regular patches
+ALPHA_PATCH_BASE = 50
+DEV_REFSPEC = "+refs/heads/dev:refs/remotes/origin/dev"
 
 
 def increase_version(version_number: str, version: str) -> str:
@@ -47,31 +35,16 @@ def get_new_version_number(version: str, verbose: bool):
     return final_version
 
 
-def pull_relevant_branches(dry_run: bool, verbose: bool):
-    execute("git fetch origin main:main", read_result=True, dry_run=dry_run, verbose=verbose)
-    execute("git pull origin dev", read_result=True, dry_run=dry_run, verbose=verbose)
-    # execute("git fetch origin release-beta:release-beta", read_result=True, dry_run=dry_run, verbose=verbose)
-
-
-def create_alpha_branch(alpha_version: str, dry_run: bool, verbose: bool):
-    execute(f'git checkout -b "release-alpha_{alpha_version}"', False, dry_run, verbose)
-
-
 def set_patch_of_alpha(version: str, verbose: bool):
     major, minor, patch = version.split(".")
 
-    # Ignore error because it will return error if the result is empty
-    result = execute(
-        f'git tag | grep -oE "{major}\\.{minor}(\\.[5-9][0-9]+)"',
-        read_result=True, dry_run=False, verbose=verbose, shouldIgnoreError=True
-    )
-
-    result_lines = result.splitlines()
-    latest_tag = result.splitlines()[-1].split(".") if len(result_lines) > 0 else None
-    if latest_tag is None:
-        patch_version = 50
+    tag_index = TagIndex.from_remote(verbose=verbose) if is_shallow_repository(verbose=verbose) \
+        else TagIndex.from_repo(verbose=verbose)
+    latest_patch = tag_index.highest_patch(int(major), int(minor), ALPHA_PATCH_BASE)
+    if latest_patch is None:
+        patch_version = ALPHA_PATCH_BASE
     else:
-        patch_version = int(latest_tag[-1]) + 1
+        patch_version = latest_patch + 1
     return ".".join([major, minor, str(patch_version)])
 
 
@@ -141,25 +114,119 @@ git-pc-release.py alpha patch -vp
         action='store_true',
         help='Automatically push changes to start circle CI build'
     )
+    trace.add_arguments(parser)
     args = parser.parse_args()
+    trace.configure(args)
     return args.variant, args.version, args.message, args.dry_run, args.push, args.verbose
 
 
-def main():
-    variant, version, message, dry_run, push, verbose = get_args()
-    validate_variant_and_message(message, variant)
+class Step:
+    name: str
+    # Either the command itself or a function building it once the steps before it have run
+    command: list[str] | Callable[[], list[str]]
+    # What a dry run prints instead of building a command, which may need the network
+    preview: list[str] | None
+    # Runs right before the command, never in a dry run
+    prepare: Callable[[], None] | None
+
+    def __init__(self, name: str, command: list[str] | Callable[[], list[str]], preview: list[str] | None = None,
+                 prepare: Callable[[], None] | None = None):
+        self.name = name
+        self.command = command
+        self.preview = preview
+        self.prepare = prepare
+
+    def resolve(self) -> list[str]:
+        return self.command() if callable(self.command) else self.command
+
+
+def get_variant_branch(variant: str) -> str:
+    return "release-beta" if variant == 'beta' else "main"
+
+
+def commit_command(variant: str, final_version: str, message: str) -> list[str]:
+    return ["git", "commit", "--allow-empty", "-m", f"build_{variant}_{final_version}\n{message}"]
+
+
+def build_release_plan(variant: str, version: str, message: str, push: bool, verbose: bool) -> list[Step]:
+    # Every step but the fetch writes to the repository and takes its index and ref locks, and each one
+    # works on what the one before it left, so they run one after the other
     if variant == "alpha":
-        highest_version, _ = get_current_highest_version_and_variant(verbose)
-        alpha_version = set_patch_of_alpha(highest_version, verbose)
-        create_alpha_branch(alpha_version, dry_run, verbose)
-        commit_and_push(dry_run, alpha_version, message, push, variant, verbose)
+        alpha_version = functools.cache(
+            lambda: set_patch_of_alpha(get_current_highest_version_and_variant(verbose)[0], verbose)
+        )
+        steps = [
+            Step("create alpha branch", lambda: ["git", "checkout", "-b", f"release-alpha_{alpha_version()}"],
+                 preview=["git", "checkout", "-b", "release-alpha_<next alpha version>"]),
+            Step("commit", lambda: commit_command(variant, alpha_version(), message),
+                 preview=commit_command(variant, "<next alpha version>", message)),
+        ]
     else:
-        pull_relevant_branches(dry_run, verbose)
-        final_version = get_new_version_number(version, verbose)
-        checkout_variant_branch(dry_run, variant, verbose)
-        merge_dev(dry_run, verbose)
-        commit_and_push(dry_run, final_version, message, push, variant, verbose)
+        branch = get_variant_branch(variant)
+        # One round trip for every branch involved. dev only updates origin/dev, which is merged
+        # directly below instead of pulling dev into the checked out branch first
+        refspecs = ["main:main", DEV_REFSPEC] + (["release-beta:release-beta"] if variant == 'beta' else [])
+        steps = [Step("fetch", command) for command in fetch_commands(refspecs, verbose=verbose)] + [
+            Step("stash", ["git", "stash"]),
+            Step("checkout", ["git", "checkout", branch]),
+            Step(
+                "merge dev", ["git", "merge", "--no-edit", "origin/dev"],
+                # A shallow clone may need older history before the branch and dev share a commit
+                prepare=lambda: ensure_merge_base(branch, "origin/dev", verbose=verbose)
+            ),
+            Step("commit", lambda: commit_command(variant, get_new_version_number(version, verbose), message),
+                 preview=commit_command(variant, f"<next {version} version>", message)),
+        ]
+    if push:
+        steps.append(Step("push", ["git", "push", "origin", "HEAD"]))
+    return steps
+
+
+def print_plan(steps: list[Step]):
+    for number, step in enumerate(steps, start=1):
+        command = step.preview if callable(step.command) else step.command
+        print(f"{number}. {shlex.join(command)}", flush=True)
+
+
+def run_step(step: Step, verbose: bool) -> float:
+    start = time.perf_counter()
+    with trace.span(step.name, "phase"):
+        if step.prepare:
+            step.prepare()
+        output = run_command(step.resolve(), verbose=verbose)
+    if verbose and output:
+        print(output, flush=True)
+    return time.perf_counter() - start
+
+
+def run_plan(steps: list[Step], verbose: bool) -> list[(str, float)]:
+    return [(step.name, run_step(step, verbose)) for step in steps]
+
+
+def report_timings(timings: list[(str, float)]):
+    name_width = max(len(name) for name, _ in timings)
+    for name, seconds in timings:
+        print(f"{name:<{name_width}} {seconds:>7.3f}s", file=sys.stderr)
+
+
+def release(variant: str, version: str, message: str, dry_run: bool, push: bool, verbose: bool):
+    steps = build_release_plan(variant, version, message, push, verbose)
+    if dry_run:
+        print_plan(steps)
+        return
+    report_timings(run_plan(steps, verbose))
+
+
+def main() -> int:
+    variant, version, message, dry_run, push, verbose = get_args()
+    validate_variant_and_message(message, variant)
+    try:
+        release(variant, version, message, dry_run, push, verbose)
+    except CommandError as error:
+        print(error, file=sys.stderr)
+        return error.returncode
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,20 +1,24 @@
 import argparse
-from api.clickup_api import get_clickup_task
+from api.clickup_api import bulk_get_clickup_tasks
+from common import trace
+
+
+def render_task_list(tasks: list[dict]) -> str:
+    with trace.span("markdown list", "render", tasks=len(tasks)):
+        return "%0A".join([f"- [{task['name']}]({task['url']})" for task in tasks])
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("task_ids", nargs="+", help="The task ids to generate links for")
+    trace.add_arguments(parser)
 
     args = parser.parse_args()
+    trace.configure(args)
     task_ids = args.task_ids
-    tasks = []
-    for task_id in task_ids:
-        task = get_clickup_task(task_id)
-        if task:
-            tasks.append(task)
+    tasks = [task for task in bulk_get_clickup_tasks(task_ids).values() if task]
 
-    print("%0A".join([f"- [{task['name']}]({task['url']})" for task in tasks]))
+    print(render_task_list(tasks))
 
 
 if __name__ == "__main__":
@@ -1,17 +1,25 @@
 import argparse
 import re
 
+from common import trace
+
+
+def parse_bot_comment(bot_comment: str) -> list[str]:
+    # should be something like "Link to `CU-12ab`, `CU-56cd`"
+    if bot_comment.startswith("Link to "):
+        return re.findall(r'CU-\w+', bot_comment)
+    return []
+
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("bot_comment", type=str, help="The bot comment to parse")
+    trace.add_arguments(parser)
 
     args = parser.parse_args()
-    bot_comment = args.bot_comment # should be something like "Link to `CU-12ab`, `CU-56cd`"
-    if bot_comment.startswith("Link to "):
-        task_ids = re.findall(r'CU-\w+', bot_comment)
-        for task_id in task_ids:
-            print(task_id)
+    trace.configure(args)
+    for task_id in parse_bot_comment(args.bot_comment):
+        print(task_id)
 
 
 if __name__ == "__main__":
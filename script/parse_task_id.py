@@ -1,6 +1,8 @@
 import argparse
 import re
 
+from common import trace
+
 
 def parse_clickup_task_id(task_str: str) -> str:
     if task_str.startswith("CU-"):
@@ -21,8 +23,10 @@ def main():
         help="The task ids in the form of CU-<task-id>, <task-id>, https://app.clickup.com/t/<task-id> or "
              "clickup generated branch name"
     )
+    trace.add_arguments(parser)
 
     args = parser.parse_args()
+    trace.configure(args)
     task_ids = set()
     for task_id in args.task_ids:
         task_ids.add(parse_clickup_task_id(task_id))
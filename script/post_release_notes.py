@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from api.slack_api import post_messages, SlackError
+from common import trace
+
+
+def read_messages(file) -> list[dict]:
+    # One JSON payload per line, as printed by generate_release_note.py
+    return [json.loads(line) for line in file if line.strip()]
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='post_release_notes',
+        description='Post release notes to Slack through SLACK_WEBHOOK_URL, or SLACK_BOT_TOKEN and SLACK_CHANNEL',
+    )
+    parser.add_argument(
+        "input", type=str, nargs="?", help="File with one Slack payload per line, standard input if omitted"
+    )
+    parser.add_argument(
+        "--thread", action="store_true",
+        help="With a bot token, post every message after the first as a reply in its thread"
+    )
+    trace.add_arguments(parser)
+    args = parser.parse_args()
+    trace.configure(args)
+    return args
+
+
+def main() -> int:
+    args = get_args()
+    try:
+        if args.input:
+            with open(args.input) as file:
+                messages = read_messages(file)
+        else:
+            messages = read_messages(sys.stdin)
+    except ValueError as error:
+        print(f"Release notes are not one JSON payload per line: {error}", file=sys.stderr)
+        return 1
+
+    if not messages:
+        print("No release notes to post", file=sys.stderr)
+        return 0
+    try:
+        count = post_messages(messages, args.thread)
+    except SlackError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(f"Posted {count} Slack messages", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,34 @@
+from __future__ import annotations
+
 import argparse
-import requests
 import json
-import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
+from api import http
+from api.clickup_api import get_clickup_token, get_clickup_api_url, send_request, DEFAULT_CONCURRENCY
+from api.task_cache import get_task_cache
+from common import trace
 
-def get_clickup_token() -> str:
-    return os.environ["CLICKUP_TOKEN"]
 
+class UpdateResult:
+    task_id: str
+    success: bool
+    attempts: int
+    # The updated task as returned by the PUT, so callers don't have to fetch it again
+    task: dict | None
 
-def update_task_status(task_id: str, status: str) -> bool:
-    resp = requests.put(
-        f'https://api.clickup.com/api/v2/task/{task_id}',
+    def __init__(self, task_id: str, success: bool, attempts: int, task: dict | None = None):
+        self.task_id = task_id
+        self.success = success
+        self.attempts = attempts
+        self.task = task
+
+
+def update_task_status_with_result(task_id: str, status: str) -> UpdateResult:
+    resp, attempts = send_request(
+        "PUT",
+        f'{get_clickup_api_url()}/task/{task_id}',
         headers={
             "Authorization": get_clickup_token(),
             "Content-Type": "application/json"
@@ -20,24 +38,59 @@ def update_task_status(task_id: str, status: str) -> bool:
         })
     )
 
-    return resp.status_code == 200
+    if resp is None or resp.status_code != 200:
+        return UpdateResult(task_id, False, attempts)
+
+    task = json.loads(resp.text)
+    cache = get_task_cache()
+    if cache:
+        cache.put(task_id, task)
+    return UpdateResult(task_id, True, attempts, task)
+
+
+def update_task_status(task_id: str, status: str) -> bool:
+    return update_task_status_with_result(task_id, status).success
+
+
+def update_task_statuses(task_ids: list[str], status: str,
+                         concurrency: int = DEFAULT_CONCURRENCY) -> dict[str, UpdateResult]:
+    unique_ids = list(dict.fromkeys(task_ids))
+    if not unique_ids:
+        return {}
+
+    workers = max(1, min(concurrency, len(unique_ids)))
+    http.reserve_connections(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda task_id: update_task_status_with_result(task_id, status), unique_ids)
+        return dict(zip(unique_ids, results))
+
+
+def report(results: dict[str, UpdateResult]):
+    succeeded = [result.task_id for result in results.values() if result.success]
+    retried = [result.task_id for result in results.values() if result.attempts > 1]
+    failed = [result.task_id for result in results.values() if not result.success]
+    print(f"Updated: {' '.join(succeeded) or '-'}", file=sys.stderr)
+    print(f"Retried: {' '.join(retried) or '-'}", file=sys.stderr)
+    print(f"Failed: {' '.join(failed) or '-'}", file=sys.stderr)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("status", help="The status to update the task to")
     parser.add_argument("task_ids", nargs="+", help="The task ids to update status for")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help="Maximum number of status updates sent at the same time"
+    )
+    trace.add_arguments(parser)
 
     args = parser.parse_args()
-    status = args.status
-    task_ids = args.task_ids
-
-    updated_task_ids = set()
-    for task_id in task_ids:
-        if update_task_status(task_id, status):
-            updated_task_ids.add(task_id)
+    trace.configure(args)
+    results = update_task_statuses(args.task_ids, args.status, args.concurrency)
+    report(results)
 
-    print(" ".join(updated_task_ids))
+    # stdout only carries the updated ids because the workflows read it
+    print(" ".join(result.task_id for result in results.values() if result.success))
 
 
 if __name__ == "__main__":